@@ -0,0 +1,4 @@
+# Video pipeline, caches, API clients and servers shared by every page and
+# worker process. Modules hold their state at module level, so importing them
+# from several pages still gives one warm cache and one connection pool per
+# process.
@@ -0,0 +1,69 @@
+import os
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from . import servers
+
+# Small HTTP server for generated static assets (thumbnails). File names are
+# content hashed, so responses can be cached by the browser forever and
+# Streamlit reruns never resend the bytes. Started once per process on first
+# use, or standalone with: python -m engine.asset_server
+# The browser fetches ASSET_BASE_URL itself, so it must be set to an address
+# every viewer can reach (and https when Streamlit is); without it thumbnails
+# stay inline data URIs.
+ASSET_DIR = os.environ.get("ASSET_DIR", "../.cache/static")
+ASSET_HOST = os.environ.get("ASSET_HOST", "0.0.0.0")
+ASSET_PORT = int(os.environ.get("ASSET_PORT", "8503"))
+# e.g. https://assets.example.com, proxied to ASSET_PORT
+ASSET_BASE_URL = os.environ.get("ASSET_BASE_URL")
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def enabled():
+    return bool(ASSET_BASE_URL)
+
+
+class AssetRequestHandler(SimpleHTTPRequestHandler):
+    status = None
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        # Only a served file (or its revalidation) may be cached; a 404 must
+        # not stick once the asset has been written
+        if self.status in (200, 304):
+            self.send_header("Cache-Control", f"public, max-age={ASSET_MAX_AGE}, immutable")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        super().end_headers()
+
+    def list_directory(self, path):
+        self.send_error(404, "File not found")
+        return None
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=ASSET_HOST, port=ASSET_PORT, directory=ASSET_DIR):
+    os.makedirs(directory, exist_ok=True)
+    handler = partial(AssetRequestHandler, directory=directory)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def ensure_server():
+    servers.ensure_server("asset-server", make_server, ASSET_PORT)
+
+
+def asset_path(relative_path):
+    return os.path.join(ASSET_DIR, relative_path)
+
+
+def asset_url(relative_path):
+    return f"{ASSET_BASE_URL}/{relative_path}"
+
+
+if __name__ == "__main__":
+    print(f"Serving {ASSET_DIR} on {ASSET_HOST}:{ASSET_PORT}")
+    make_server().serve_forever()
@@ -0,0 +1,105 @@
+import os
+import json
+import argparse
+from PIL import Image
+
+from . import clip_cache
+from . import thumbnail_cache
+
+# Pre-renders every gallery thumbnail and records them in a manifest that
+# thumbnail_cache loads at startup. Run from the app directory:
+#   python -m engine.build_thumbnails
+# Only images whose content hash changed since the last run are re-rendered.
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def scan_images(images_dir):
+    names = []
+    for root, dirs, files in os.walk(images_dir):
+        for file_name in files:
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                rel_path = os.path.relpath(os.path.join(root, file_name), images_dir)
+                names.append(rel_path.replace(os.sep, "/"))
+    return sorted(names)
+
+
+def thumbnail_name(name, sha256, width, height):
+    stem = os.path.splitext(name)[0].replace("/", "_")
+    return f"{stem}.{thumbnail_cache.size_label(width, height)}.{sha256[:12]}.jpg"
+
+
+def is_up_to_date(entry, sha256, sizes, out_dir):
+    if entry is None or entry.get("sha256") != sha256:
+        return False
+    for width, height in sizes:
+        thumbnail = entry["thumbnails"].get(thumbnail_cache.size_label(width, height))
+        if thumbnail is None or not os.path.exists(os.path.join(out_dir, thumbnail)):
+            return False
+    return True
+
+
+def build(images_dir, out_dir, sizes, quality, force=False):
+    os.makedirs(out_dir, exist_ok=True)
+    old_manifest = thumbnail_cache.load_manifest(out_dir)
+    manifest = {"version": 1, "quality": quality, "images": {}}
+    # Thumbnails rendered at another quality tier cannot be reused
+    force = force or old_manifest.get("quality") != quality
+    built, skipped = 0, 0
+
+    for name in scan_images(images_dir):
+        source_path = os.path.join(images_dir, name)
+        sha256 = clip_cache.file_hash(source_path)
+        entry = old_manifest["images"].get(name)
+        if not force and is_up_to_date(entry, sha256, sizes, out_dir):
+            manifest["images"][name] = entry
+            skipped += 1
+            continue
+
+        with Image.open(source_path) as img:
+            source_width, source_height = img.size
+        entry = {
+            "sha256": sha256,
+            "bytes": os.path.getsize(source_path),
+            "width": source_width,
+            "height": source_height,
+            "thumbnails": {},
+        }
+        for width, height in sizes:
+            thumbnail = thumbnail_name(name, sha256, width, height)
+            data = thumbnail_cache.render_thumbnail(source_path, width, height, quality)
+            with open(os.path.join(out_dir, thumbnail), "wb") as f:
+                f.write(data)
+            entry["thumbnails"][thumbnail_cache.size_label(width, height)] = thumbnail
+        manifest["images"][name] = entry
+        built += 1
+        print(f"Built thumbnails for {name}")
+
+    # Drop thumbnails that no longer belong to any image
+    keep = {t for entry in manifest["images"].values() for t in entry["thumbnails"].values()}
+    for entry in old_manifest["images"].values():
+        for thumbnail in entry["thumbnails"].values():
+            if thumbnail not in keep and os.path.exists(os.path.join(out_dir, thumbnail)):
+                os.remove(os.path.join(out_dir, thumbnail))
+
+    tmp_path = os.path.join(out_dir, thumbnail_cache.MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(out_dir, thumbnail_cache.MANIFEST_NAME))
+    print(f"Manifest written: {built} built, {skipped} unchanged")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render gallery thumbnails")
+    parser.add_argument("--images-dir", default=thumbnail_cache.IMAGES_DIR)
+    parser.add_argument("--out-dir", default=thumbnail_cache.BUILD_DIR)
+    parser.add_argument("--quality", default=thumbnail_cache.DEFAULT_QUALITY,
+                        choices=sorted(thumbnail_cache.QUALITY_TIERS))
+    parser.add_argument("--force", action="store_true", help="rebuild every image")
+    args = parser.parse_args()
+    build(args.images_dir, args.out_dir, thumbnail_cache.THUMBNAIL_SIZES, args.quality, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import json
+import threading
+import urllib.request
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import servers
+
+# Optional push-based completion. When LUMA_CALLBACK_URL is set, generations
+# are created with that callback_url and this receiver wakes the waiting job
+# as soon as Luma reports the generation finished. Jobs that hear nothing
+# within CALLBACK_DEADLINE fall back to polling. Only one process per host
+# can own the receiver port; in the others callback mode switches itself off
+# and their jobs poll, since notifications would never reach them.
+CALLBACK_URL = os.environ.get("LUMA_CALLBACK_URL")
+CALLBACK_HOST = os.environ.get("LUMA_CALLBACK_HOST", "0.0.0.0")
+CALLBACK_PORT = int(os.environ.get("LUMA_CALLBACK_PORT", "8504"))
+CALLBACK_PATH = "/luma/callback"
+# Shared secret expected as ?token=... on the callback URL, when set
+CALLBACK_TOKEN = os.environ.get("LUMA_CALLBACK_TOKEN")
+CALLBACK_DEADLINE = float(os.environ.get("LUMA_CALLBACK_DEADLINE", "300"))
+FINAL_STATES = ("completed", "failed")
+RECEIVER_NAME = "luma-callbacks"
+MAX_RESULTS = 1000
+
+_lock = threading.Lock()
+_events = {}
+# generation id -> final generation payload, also for waiters that arrive late
+_results = OrderedDict()
+_stats = {"received": 0, "woken": 0, "timeouts": 0}
+
+
+def enabled():
+    # False once this process failed to start the receiver
+    return bool(CALLBACK_URL) and not servers.failed(RECEIVER_NAME)
+
+
+def callback_url():
+    if CALLBACK_TOKEN and "token=" not in CALLBACK_URL:
+        separator = "&" if "?" in CALLBACK_URL else "?"
+        return f"{CALLBACK_URL}{separator}token={CALLBACK_TOKEN}"
+    return CALLBACK_URL
+
+
+def deliver(generation):
+    # Records a final generation payload and wakes whoever waits on it
+    generation_id = generation.get("id")
+    if not generation_id or generation.get("state") not in FINAL_STATES:
+        return
+    with _lock:
+        _stats["received"] += 1
+        _results[generation_id] = generation
+        while len(_results) > MAX_RESULTS:
+            _results.popitem(last=False)
+        event = _events.pop(generation_id, None)
+    if event is not None:
+        event.set()
+
+
+def wait_for_generation(generation_id, timeout=CALLBACK_DEADLINE):
+    # Blocks until a final payload arrives; returns it, or None on timeout
+    with _lock:
+        generation = _results.get(generation_id)
+        if generation is not None:
+            return generation
+        event = _events.setdefault(generation_id, threading.Event())
+    woken = event.wait(timeout)
+    with _lock:
+        if not woken and _events.get(generation_id) is event:
+            del _events[generation_id]
+        generation = _results.get(generation_id)
+        _stats["woken" if woken else "timeouts"] += 1
+    return generation
+
+
+class CallbackRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != CALLBACK_PATH:
+            self.send_error(404, "Not found")
+            return
+        if CALLBACK_TOKEN and parse_qs(url.query).get("token", [None])[0] != CALLBACK_TOKEN:
+            self.send_error(403, "Forbidden")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            generation = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400, "Invalid JSON")
+            return
+        deliver(generation)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=CALLBACK_HOST, port=CALLBACK_PORT):
+    return ThreadingHTTPServer((host, port), CallbackRequestHandler)
+
+
+def ensure_receiver():
+    # True when this process receives callbacks; if not, its jobs poll
+    return servers.ensure_server(RECEIVER_NAME, make_server, CALLBACK_PORT) is not None
+
+
+def notify(generation_id, assets=None, state="completed", url=None):
+    # Local stand-in for Luma's notification, for tests and offline runs
+    url = url or f"http://localhost:{CALLBACK_PORT}{CALLBACK_PATH}"
+    if CALLBACK_TOKEN and "token=" not in url:
+        url = f"{url}?token={CALLBACK_TOKEN}"
+    body = json.dumps({"id": generation_id, "state": state, "assets": assets}).encode("utf-8")
+    request = urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.status
+
+
+def callback_stats():
+    with _lock:
+        return dict(_stats)
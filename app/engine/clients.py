@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+
+# One long-lived client per external service and process, built on first use
+# and shared by every session and thread: the Luma SDK over a pooled httpx
+# client, a requests Session for media downloads and cloudinary's urllib3
+# pool. Connections (and their TLS handshakes) are reused across jobs instead
+# of paid for on every call. Pool sizes and timeouts are set per deployment.
+LUMA_POOL_SIZE = int(os.environ.get("LUMA_POOL_SIZE", "20"))
+LUMA_TIMEOUT = float(os.environ.get("LUMA_TIMEOUT", "30"))
+LUMA_MAX_RETRIES = int(os.environ.get("LUMA_MAX_RETRIES", "2"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", os.environ.get("DOWNLOAD_POOL_SIZE", "8")))
+# (connect, read) timeouts in seconds
+HTTP_TIMEOUT = (10, float(os.environ.get("HTTP_READ_TIMEOUT", "60")))
+CLOUDINARY_POOL_SIZE = int(os.environ.get("CLOUDINARY_POOL_SIZE", os.environ.get("UPLOAD_WORKERS", "4")))
+CLOUDINARY_TIMEOUT = float(os.environ.get("CLOUDINARY_TIMEOUT", "60"))
+CONNECT_TIMEOUT = 10
+
+_clients = {}
+_build_seconds = {}
+_lock = threading.Lock()
+
+
+def _get(name, build):
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            # A failed build (e.g. a missing API key) is retried on the next call
+            started = time.perf_counter()
+            client = build()
+            _build_seconds[name] = time.perf_counter() - started
+            _clients[name] = client
+    return client
+
+
+def _build_luma():
+    import httpx
+    from lumaai import LumaAI, DefaultHttpxClient
+    timeout = httpx.Timeout(LUMA_TIMEOUT, connect=CONNECT_TIMEOUT)
+    limits = httpx.Limits(max_connections=LUMA_POOL_SIZE, max_keepalive_connections=LUMA_POOL_SIZE)
+    # base_url still comes from LUMAAI_BASE_URL when set
+    return LumaAI(
+        auth_token=os.environ.get("LUMAAI_API_KEY"),
+        timeout=timeout,
+        max_retries=LUMA_MAX_RETRIES,
+        http_client=DefaultHttpxClient(limits=limits, timeout=timeout),
+    )
+
+
+def _build_http_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=("GET", "HEAD"))
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _build_cloudinary():
+    import urllib3
+    import cloudinary
+    import cloudinary.uploader
+    from cloudinary import utils
+    # cloudinary.uploader keeps a module level urllib3 pool sized for one
+    # connection per host; concurrent uploads would open and discard extra
+    # connections. Swap in one sized for the upload pool, keeping its proxy
+    # and TCP keep-alive handling.
+    options = dict(cloudinary.CERT_KWARGS, maxsize=CLOUDINARY_POOL_SIZE, block=False,
+                   timeout=urllib3.Timeout(connect=CONNECT_TIMEOUT, read=CLOUDINARY_TIMEOUT))
+    cloudinary.uploader._http = utils.get_http_connector(cloudinary.config(), options)
+    return cloudinary.uploader
+
+
+def luma():
+    return _get("luma", _build_luma)
+
+
+def http_session():
+    return _get("http", _build_http_session)
+
+
+def cloudinary_uploader():
+    return _get("cloudinary", _build_cloudinary)
+
+
+def client_stats():
+    with _lock:
+        return {f"{name}_build_seconds": seconds for name, seconds in _build_seconds.items()}
@@ -0,0 +1,113 @@
+import os
+import time
+import hashlib
+import threading
+
+# On-disk cache of downloaded Luma clips. A clip is identified by the content
+# hash of its source image, the camera prompt, the aspect ratio and the model,
+# so animating a popular gallery image again is a file lookup instead of an
+# upload, a generation, minutes of polling and a download.
+CLIP_CACHE_DIR = os.environ.get("CLIP_CACHE_DIR", "../.cache/clips")
+# Least recently used clips are removed by the janitor (workspaces.py) once
+# the cache outgrows this; clips used within CLIP_CACHE_MIN_AGE seconds are
+# kept regardless, since a running job may be about to stitch them
+CLIP_CACHE_BUDGET = int(os.environ.get("CLIP_CACHE_BUDGET", str(2 * 1024 ** 3)))
+CLIP_CACHE_MIN_AGE = float(os.environ.get("CLIP_CACHE_MIN_AGE", "3600"))
+# Luma requires a model on every generation; part of the key
+LUMA_MODEL = os.environ.get("LUMA_MODEL", "ray-2")
+# The API the clips come from is part of the key too, so clips from a fake
+# endpoint (fake_services.py) are never served once the real one is back
+LUMA_BASE_URL = os.environ.get("LUMAAI_BASE_URL") or "https://api.lumalabs.ai/dream-machine/v1"
+# Changing the seed reshuffles which prompt each image gets
+PROMPT_SEED = os.environ.get("PROMPT_SEED", "0")
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evicted": 0, "usage_bytes": 0}
+
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def choose_prompt(image_digest, prompts, seed=PROMPT_SEED):
+    # Deterministic per image, so the same image keeps hitting the same clip
+    index = int(hashlib.sha256(f"{seed}:{image_digest}".encode("utf-8")).hexdigest(), 16) % len(prompts)
+    return prompts[index]
+
+
+def clip_key(image_digest, prompt, aspect_ratio, model=LUMA_MODEL, base_url=LUMA_BASE_URL):
+    raw = f"{image_digest}|{prompt}|{aspect_ratio}|{model}|{base_url}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def clip_path(key):
+    return os.path.join(CLIP_CACHE_DIR, key[:2], f"{key}.mp4")
+
+
+def lookup(key):
+    path = clip_path(key)
+    try:
+        # mtime doubles as the last use for eviction
+        os.utime(path)
+        found = True
+    except FileNotFoundError:
+        found = False
+    with _lock:
+        _stats["hits" if found else "misses"] += 1
+    return path if found else None
+
+
+def store(key, download):
+    # download(tmp_path) writes the clip; it only becomes visible once complete
+    path = clip_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        download(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def enforce_budget(budget=None):
+    # Removes least recently used clips until the cache fits; returns the
+    # number removed
+    budget = CLIP_CACHE_BUDGET if budget is None else budget
+    clips = []
+    for root, _, files in os.walk(CLIP_CACHE_DIR):
+        for name in files:
+            if not name.endswith(".mp4"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            clips.append((stat.st_mtime, stat.st_size, path))
+    usage = sum(size for _, size, _ in clips)
+    evicted = 0
+    cutoff = time.time() - CLIP_CACHE_MIN_AGE
+    for mtime, size, path in sorted(clips):
+        if usage <= budget or mtime > cutoff:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        usage -= size
+        evicted += 1
+    with _lock:
+        _stats["evicted"] += evicted
+        _stats["usage_bytes"] = usage
+    return evicted
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,51 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import clients
+from . import metrics
+
+# Clip downloads share the process-wide keep-alive session and run
+# concurrently, so a multi-clip job takes about as long as its largest clip.
+# Files are written in large buffered chunks.
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "4"))
+CHUNK_SIZE = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download")
+
+
+def download_file(url, output_path):
+    # Returns {"url", "bytes", "seconds", "throughput"} with throughput in bytes/s
+    started = time.perf_counter()
+    size = 0
+    with metrics.call("http.download") as download_span:
+        with clients.http_session().get(url, stream=True, timeout=clients.HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(output_path, 'wb', buffering=CHUNK_SIZE) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+        download_span["bytes"] = size
+    seconds = time.perf_counter() - started
+    return {"url": url, "bytes": size, "seconds": seconds, "throughput": size / seconds if seconds else 0.0}
+
+
+def run_concurrently(tasks, on_done=None):
+    # Runs callables on the download pool; returns (result, error) pairs in input
+    # order. on_done(index, result, error) runs on the calling thread.
+    futures = {_executor.submit(metrics.bind_context(task)): index for index, task in enumerate(tasks)}
+    outcomes = [None] * len(futures)
+    for future in as_completed(futures):
+        index = futures[future]
+        try:
+            outcome = (future.result(), None)
+        except Exception as e:
+            outcome = (None, e)
+        outcomes[index] = outcome
+        if on_done:
+            on_done(index, *outcome)
+    return outcomes
+
+
+def format_stats(stats):
+    return f"{stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.1f}s, {stats['throughput'] / 1e6:.1f} MB/s"
@@ -0,0 +1,32 @@
+# Gallery events. Each one gets a page under pages/ that only calls
+# gallery.render(<name>), and a card on the landing page, so adding an event
+# means adding an entry here plus that three line page.
+PROMPTS = ["Very slow Zoom In while panning from left to right", "Slowly Orbit Right with consistent speed",
+           "Slo-mo zoom in", "Slow Push In", "Crane Right"]
+
+EVENTS = {
+    "indian_independence": {
+        "title": "Indian Independence Struggle",
+        "card_title": "Indian Independence Struggle",
+        "card_image": "../images/mahatma-gandhi.jpg",
+        "page_icon": "⏳",
+        "images": [f"../images/indian_independence_{i}.jpg" for i in range(1, 6)],
+        "sample_video": "../videos/sample_independence_video.mp4",
+    },
+    "oppenheimer": {
+        "title": "The Real Oppenheimer",
+        "card_title": "The Real Oppenheimer",
+        "card_image": "../images/oppenheimer.jpg",
+        "page_icon": "⏳",
+        "images": [f"../images/opp_{i}.jpg" for i in range(1, 6)],
+        "sample_video": "../videos/sample_opp_video.mp4",
+    },
+    "personal_events": {
+        "title": "Personal Events",
+        "card_title": "Personal History",
+        "card_image": "../images/personal_history_2.jpeg",
+        "page_icon": ":wedding:",
+        "images": [f"../images/personal_history_{i}.jpeg" for i in range(1, 6)],
+        "sample_video": "../videos/sample_personal_video.mp4",
+    },
+}
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from . import callbacks
+from . import clip_cache
+from . import metrics
+
+# Process-wide record of the Luma generations submitted for each job. A
+# (keyframe URL, prompt, aspect ratio) is created exactly once per job; any
+# repeat call, from a rerun or another thread, gets the same generation id.
+# model defaults to LUMA_MODEL; callback_url is only sent in callback mode.
+MAX_JOBS = 1000
+
+_lock = threading.Lock()
+_jobs = OrderedDict()
+_stats = {"created": 0, "reused": 0}
+
+
+def generation_key(image_url, prompt, aspect_ratio, model=None):
+    return (image_url, prompt, aspect_ratio, model)
+
+
+def submit_generation(client, job_id, image_url, prompt, aspect_ratio, model=None):
+    model = model or clip_cache.LUMA_MODEL
+    key = generation_key(image_url, prompt, aspect_ratio, model)
+    with _lock:
+        job = _jobs.setdefault(job_id, {})
+        _jobs.move_to_end(job_id)
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+        future = job.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            job[key] = future
+            _stats["created"] += 1
+        else:
+            _stats["reused"] += 1
+
+    if owner:
+        options = {"model": model}
+        if callbacks.enabled() and callbacks.ensure_receiver():
+            options["callback_url"] = callbacks.callback_url()
+        try:
+            with metrics.call("luma.create"):
+                generation = client.generations.create(
+                    prompt=prompt,
+                    aspect_ratio=aspect_ratio,
+                    keyframes={
+                        "frame0": {
+                            "type": "image",
+                            "url": image_url
+                        }
+                    },
+                    **options
+                )
+        except Exception as e:
+            # Let a later call try again instead of caching the failure
+            with _lock:
+                _jobs.get(job_id, {}).pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(generation.id)
+    return future.result()
+
+
+def forget_job(job_id):
+    # Called once the job is over; nothing can ask for its generations again
+    with _lock:
+        _jobs.pop(job_id, None)
+
+
+def generation_stats():
+    with _lock:
+        return dict(_stats)
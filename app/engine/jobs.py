@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+# Local job queue shared by the Streamlit pages (which enqueue and read status)
+# and worker.py processes (which claim and run jobs). Backed by SQLite so jobs
+# survive reruns, browser refreshes and restarts of either side.
+JOBS_PATH = os.environ.get("JOBS_PATH", "../.cache/jobs.sqlite3")
+# A running job whose worker has been silent this long is handed out again
+STALE_AFTER = float(os.environ.get("JOB_STALE_AFTER", "900"))
+# How often a worker marks its running job as alive, well inside STALE_AFTER
+HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", "30"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_local = threading.local()
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(JOBS_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(JOBS_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT, payload TEXT NOT NULL, "
+            "result TEXT, error TEXT, messages TEXT NOT NULL DEFAULT '[]', worker TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        _local.conn = conn
+    return conn
+
+
+def _as_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["messages"] = json.loads(job["messages"])
+    return job
+
+
+def enqueue(payload):
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    _connection().execute(
+        "INSERT INTO jobs (id, status, stage, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (job_id, QUEUED, QUEUED, json.dumps(payload), now, now),
+    )
+    return job_id
+
+
+def get_job(job_id):
+    return _as_dict(_connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def claim(worker_id):
+    # Atomically hands the oldest queued (or abandoned) job to this worker
+    conn = _connection()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = ? OR (status = ? AND updated_at < ?) "
+            "ORDER BY created_at LIMIT 1",
+            (QUEUED, RUNNING, now - STALE_AFTER),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, worker = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, "starting", worker_id, now, row["id"]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return _as_dict(row)
+
+
+# Every update below only applies while worker_id still owns the running job,
+# and returns False once it doesn't: a worker that went quiet past STALE_AFTER
+# may have had its job handed to another, whose results must not be overwritten.
+
+def report(job_id, worker_id, stage=None, message=None):
+    # Progress update from the worker; also acts as its heartbeat
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT stage, messages FROM jobs WHERE id = ? AND worker = ? AND status = ?",
+            (job_id, worker_id, RUNNING),
+        ).fetchone()
+        if row is not None:
+            messages = json.loads(row["messages"])
+            if message:
+                messages.append(message)
+            conn.execute(
+                "UPDATE jobs SET stage = ?, messages = ?, updated_at = ? WHERE id = ?",
+                (stage or row["stage"], json.dumps(messages), time.time(), job_id),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row is not None
+
+
+def heartbeat(job_id, worker_id):
+    cursor = _connection().execute(
+        "UPDATE jobs SET updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+        (time.time(), job_id, worker_id, RUNNING),
+    )
+    return cursor.rowcount > 0
+
+
+def finish(job_id, worker_id, result):
+    cursor = _connection().execute(
+        "UPDATE jobs SET status = ?, stage = ?, result = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+        (DONE, DONE, json.dumps(result), time.time(), job_id, worker_id, RUNNING),
+    )
+    return cursor.rowcount > 0
+
+
+def fail(job_id, worker_id, error):
+    cursor = _connection().execute(
+        "UPDATE jobs SET status = ?, stage = ?, error = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+        (FAILED, FAILED, str(error), time.time(), job_id, worker_id, RUNNING),
+    )
+    return cursor.rowcount > 0
+
+
+def is_active(job):
+    return job is not None and job["status"] in (QUEUED, RUNNING)
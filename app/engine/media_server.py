@@ -0,0 +1,223 @@
+import os
+import time
+import errno
+import shutil
+import mimetypes
+from urllib.parse import quote, unquote, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import servers
+
+# Serves videos from MEDIA_DIR over plain HTTP so pages hand st.video() a URL
+# instead of pushing the bytes through Streamlit. Opt-in: the browser fetches
+# MEDIA_BASE_URL itself, so it must be an address every viewer can reach (and
+# https when Streamlit is); without it pages hand Streamlit the file as before. Finished files
+# go out with sendfile and support Range requests (seeking) and ETag
+# revalidation, so repeat viewers cost almost nothing. A video the
+# stitcher is still writing (<name>.part next to the final path) is streamed
+# as it grows, so playback starts with the first fragment. Started once per
+# process on first use, or standalone with: python -m engine.media_server
+MEDIA_DIR = os.environ.get("MEDIA_DIR", "../videos")
+MEDIA_HOST = os.environ.get("MEDIA_HOST", "0.0.0.0")
+MEDIA_PORT = int(os.environ.get("MEDIA_PORT", "8506"))
+# e.g. https://media.example.com, proxied to MEDIA_PORT
+MEDIA_BASE_URL = os.environ.get("MEDIA_BASE_URL")
+# How long a request for a running job's output waits for the stitcher to
+# start writing it, and how long a growing file may stall before the stream
+# is ended
+MEDIA_WAIT = float(os.environ.get("MEDIA_WAIT", "60"))
+MEDIA_STALL = float(os.environ.get("MEDIA_STALL", "60"))
+# Files are revalidated against their ETag rather than trusted for a fixed time,
+# since a path may be written again with a new video
+MEDIA_CACHE_CONTROL = os.environ.get("MEDIA_CACHE_CONTROL", "no-cache")
+CHUNK_SIZE = 256 * 1024
+PART_SUFFIX = ".part"
+
+
+
+def enabled():
+    return bool(MEDIA_BASE_URL)
+
+
+def partial_path(path):
+    return path + PART_SUFFIX
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, since players issue many small range requests
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def resolve(self):
+        root = os.path.realpath(MEDIA_DIR)
+        path = os.path.realpath(os.path.join(root, unquote(urlsplit(self.path).path).lstrip("/")))
+        if os.path.commonpath([root, path]) != root or path.endswith(PART_SUFFIX):
+            return None
+        return path
+
+    def serve(self, send_body):
+        path = self.resolve()
+        if path is None:
+            self.send_error(404, "File not found")
+            return
+        # Anything but a running job's output is there or not; waiting on a
+        # bogus path would only tie up a server thread
+        from . import workspaces
+        wait = MEDIA_WAIT if workspaces.awaits_output(path) else 0
+        deadline = time.monotonic() + wait
+        while True:
+            if os.path.isfile(path):
+                self.send_file(path, send_body)
+                return
+            if os.path.isfile(partial_path(path)):
+                self.send_growing_file(path, send_body)
+                return
+            if time.monotonic() >= deadline:
+                self.send_error(404, "File not found")
+                return
+            time.sleep(0.2)
+
+    def content_type(self, path):
+        return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    def etag(self, stat):
+        return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+    def byte_range(self, size, etag):
+        # (start, end) for a single "bytes=" range, None for the whole file and
+        # False when the range can't be satisfied
+        header = self.headers.get("Range")
+        if not header or not header.startswith("bytes=") or "," in header:
+            return None
+        if self.headers.get("If-Range") not in (None, etag):
+            return None
+        start, _, end = header[len("bytes="):].strip().partition("-")
+        try:
+            if not start:
+                # Suffix range: the last N bytes
+                length = int(end)
+                if length == 0:
+                    return False
+                return max(size - length, 0), size - 1
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        except ValueError:
+            return None
+        if start >= size or start > end:
+            return False
+        return start, end
+
+    def send_file(self, path, send_body):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            etag = self.etag(stat)
+            if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", MEDIA_CACHE_CONTROL)
+                self.end_headers()
+                return
+
+            byte_range = self.byte_range(stat.st_size, etag)
+            if byte_range is False:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{stat.st_size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            start, end = byte_range or (0, stat.st_size - 1)
+            self.send_response(206 if byte_range else 200)
+            self.send_header("Content-Type", self.content_type(path))
+            self.send_header("Content-Length", str(end - start + 1))
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{stat.st_size}")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+            self.send_header("Cache-Control", MEDIA_CACHE_CONTROL)
+            self.end_headers()
+            if send_body:
+                self.send_bytes(f, start, end - start + 1)
+
+    def send_bytes(self, f, offset, count):
+        # Zero-copy from the page cache to the socket where the OS allows it
+        if hasattr(os, "sendfile"):
+            try:
+                while count > 0:
+                    sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, count)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    count -= sent
+                return
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                    raise
+        f.seek(offset)
+        while count > 0:
+            chunk = f.read(min(CHUNK_SIZE, count))
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            count -= len(chunk)
+
+    def send_growing_file(self, path, send_body):
+        # No Content-Length: the body ends when the connection closes, once
+        # the stitcher has renamed the .part file to its final name
+        try:
+            f = open(partial_path(path), "rb")
+        except FileNotFoundError:
+            # Finished between the check and the open
+            self.send_file(path, send_body)
+            return
+        with f:
+            self.send_response(200)
+            self.send_header("Content-Type", self.content_type(path))
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            if not send_body:
+                return
+            last_growth = time.monotonic()
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if chunk:
+                    self.wfile.write(chunk)
+                    last_growth = time.monotonic()
+                    continue
+                if not os.path.exists(partial_path(path)):
+                    # Renamed (finished) or removed (failed); send what's left
+                    shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+                    return
+                if time.monotonic() - last_growth > MEDIA_STALL:
+                    return
+                time.sleep(0.1)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=MEDIA_HOST, port=MEDIA_PORT):
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    return ThreadingHTTPServer((host, port), MediaRequestHandler)
+
+
+def ensure_server():
+    servers.ensure_server("media-server", make_server, MEDIA_PORT)
+
+
+def media_url(path):
+    # URL for a file under MEDIA_DIR, whether or not it has been written yet
+    relative_path = os.path.relpath(os.path.abspath(path), os.path.abspath(MEDIA_DIR))
+    return f"{MEDIA_BASE_URL}/{quote(relative_path.replace(os.sep, '/'))}"
+
+
+if __name__ == "__main__":
+    print(f"Serving {MEDIA_DIR} on {MEDIA_HOST}:{MEDIA_PORT}")
+    make_server().serve_forever()
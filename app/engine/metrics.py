@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import servers
+
+# Timing spans for every pipeline stage and external call. Each finished span
+# is observed in an in-process latency histogram, which worker processes
+# expose in Prometheus text format on http://<host>:METRICS_PORT/metrics, and,
+# when METRICS_SPANS_PATH is set, appended as one JSON line to that file.
+# Spans pick up the id of the job being run from a context variable, so code
+# deep in the pipeline needn't pass it.
+SPANS_PATH = os.environ.get("METRICS_SPANS_PATH")
+# Past this size the span file is moved to <path>.1 (replacing the previous
+# one) and a new file is started
+SPANS_MAX_BYTES = int(os.environ.get("METRICS_SPANS_MAX_BYTES", str(100 * 1024 ** 2)))
+METRICS_HOST = os.environ.get("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "8507"))
+# Histogram upper bounds in seconds, from quick API calls to long generations
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# kind -> (metric name, label name, help text)
+FAMILIES = {
+    "stage": ("video_pipeline_stage_seconds", "stage", "Time spent in each stage of a video job"),
+    "call": ("video_external_call_seconds", "call", "Latency of calls to Luma, Cloudinary, media hosts and ffmpeg"),
+    "detection": ("video_generation_detection_seconds", "method",
+                  "Estimated time between a generation finishing and the pipeline noticing"),
+}
+
+# Counters (and client build times) kept by the engine modules, exported as
+# one gauge family. Only modules this process has imported are read, so
+# /metrics never pulls in the heavy ones; a module that isn't loaded has
+# nothing to report anyway.
+STATS_METRIC = "video_engine_stat"
+STATS_SOURCES = {
+    "thumbnail_cache": "cache_stats",
+    "upload_cache": "cache_stats",
+    "clip_cache": "cache_stats",
+    "video_info": "cache_stats",
+    "generations": "generation_stats",
+    "callbacks": "callback_stats",
+    "poll_schedule": "schedule_stats",
+    "workspaces": "janitor_stats",
+    "clients": "client_stats",
+}
+
+current_job = contextvars.ContextVar("current_job", default=None)
+
+# (kind, name, status) -> {"buckets": [...], "sum": seconds, "count": n}
+_histograms = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def job_context(job_id):
+    token = current_job.set(job_id)
+    try:
+        yield
+    finally:
+        current_job.reset(token)
+
+
+def observe(kind, name, seconds, status="ok"):
+    with _lock:
+        histogram = _histograms.get((kind, name, status))
+        if histogram is None:
+            histogram = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+            _histograms[(kind, name, status)] = histogram
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+
+def write_span(record):
+    if not SPANS_PATH:
+        return
+    try:
+        os.makedirs(os.path.dirname(SPANS_PATH) or ".", exist_ok=True)
+        # One short append per span keeps lines from several processes whole
+        with open(SPANS_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            size = f.tell()
+        if size > SPANS_MAX_BYTES:
+            # Another process may rotate at the same moment; either rename wins
+            os.replace(SPANS_PATH, f"{SPANS_PATH}.1")
+    except OSError as e:
+        print(f"Could not write span: {e}")
+
+
+@contextmanager
+def span(kind, name, **attributes):
+    # with metrics.span("stage", "download"): ...
+    # with metrics.span("call", "luma.create"): ...
+    started_at = time.time()
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        observe(kind, name, seconds, status)
+        write_span({
+            "ts": started_at,
+            "job_id": current_job.get(),
+            "kind": kind,
+            "name": name,
+            "seconds": round(seconds, 6),
+            "status": status,
+            **attributes,
+        })
+
+
+def stage(name, **attributes):
+    return span("stage", name, **attributes)
+
+
+def call(name, **attributes):
+    return span("call", name, **attributes)
+
+
+def bind_context(fn):
+    # For work handed to a thread pool: run it with the submitting thread's
+    # context, so its spans keep the job id
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus():
+    with _lock:
+        histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                      for key, h in _histograms.items()}
+    lines = []
+    for kind, (metric, label, help_text) in FAMILIES.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (histogram_kind, name, status), histogram in sorted(histograms.items()):
+            if histogram_kind != kind:
+                continue
+            labels = f'{label}="{_label(name)}",status="{status}"'
+            for bound, count in zip(BUCKETS, histogram["buckets"]):
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+            lines.append(f"{metric}_sum{{{labels}}} {histogram['sum']:.6f}")
+            lines.append(f"{metric}_count{{{labels}}} {histogram['count']}")
+    lines.append(f"# HELP {STATS_METRIC} Cache, callback, polling, janitor and client counters of each engine module")
+    lines.append(f"# TYPE {STATS_METRIC} gauge")
+    for module, stats in engine_stats():
+        for stat, value in sorted(stats.items()):
+            lines.append(f'{STATS_METRIC}{{module="{module}",stat="{_label(stat)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def engine_stats():
+    # [(module, {stat: number})] for the engine modules loaded in this process
+    results = []
+    for module_name, function_name in STATS_SOURCES.items():
+        module = sys.modules.get(f"{__package__}.{module_name}")
+        if module is None:
+            continue
+        stats = getattr(module, function_name)()
+        numbers = {key: value for key, value in stats.items()
+                   if isinstance(value, (int, float)) and not isinstance(value, bool)}
+        results.append((module_name, numbers))
+    return results
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404, "Not found")
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=METRICS_HOST, port=METRICS_PORT):
+    return ThreadingHTTPServer((host, port), MetricsRequestHandler)
+
+
+def ensure_server(port=None):
+    # Each process on a host needs its own port; see worker.py --metrics-port
+    port = METRICS_PORT if port is None else port
+    servers.ensure_server("metrics-server", lambda: make_server(port=port), port)
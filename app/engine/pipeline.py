@@ -0,0 +1,344 @@
+import os
+import re
+import time
+import tempfile
+import ffmpeg
+
+from . import clients
+from . import metrics
+from . import uploads
+from . import generations
+from . import poller
+from . import clip_cache
+from . import downloads
+from . import video_info
+from . import media_server
+from . import workspaces
+
+# The upload -> generate -> poll -> download -> stitch chain for one job. It
+# runs in worker.py, outside Streamlit; progress goes through
+# report(stage, message) instead of st.write.
+ASPECT_RATIO = "16:9"
+
+# Encoder settings for clips that have to be re-encoded while stitching. gop is
+# the keyframe interval in frames. A worker process runs several jobs at once,
+# so the cheap profiles leave cores to the others; threads=0 (archive) lets
+# the encoder take all of them.
+CPU_COUNT = os.cpu_count() or 1
+ENCODER_PROFILES = {
+    "fast-preview": {"preset": "veryfast", "crf": 28, "threads": max(1, CPU_COUNT // 4), "gop": 48},
+    "balanced": {"preset": "medium", "crf": 23, "threads": max(1, CPU_COUNT // 2), "gop": 48},
+    "archive": {"preset": "slow", "crf": 18, "threads": 0, "gop": 240},
+}
+DEFAULT_PROFILE = os.environ.get("STITCH_PROFILE", "balanced")
+# Fragmented MP4: an empty moov up front and a new fragment at every keyframe
+# or second of video, so media_server.py can stream the output while it's
+# still being written and the browser starts playing after the first fragment
+OUTPUT_OPTIONS = {"format": "mp4", "movflags": "+frag_keyframe+empty_moov+default_base_moof",
+                  "frag_duration": 1000000, "flush_packets": 1}
+
+
+def check_profile(profile):
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile {profile!r}, expected one of {', '.join(ENCODER_PROFILES)}")
+    return profile
+
+
+check_profile(DEFAULT_PROFILE)
+
+
+def plan_clips(image_paths, prompts, labels=None):
+    # One clip per selected image, in selection order. The prompt is fixed per
+    # image so a clip generated earlier can come straight from the clip cache
+    labels = labels or [str(i + 1) for i in range(len(image_paths))]
+    clips = []
+    for label, image_path in zip(labels, image_paths):
+        image_digest = clip_cache.file_hash(image_path)
+        prompt = clip_cache.choose_prompt(image_digest, prompts)
+        key = clip_cache.clip_key(image_digest, prompt, ASPECT_RATIO)
+        clips.append({"label": label, "image_path": image_path, "prompt": prompt,
+                      "key": key, "path": clip_cache.lookup(key)})
+    return clips
+
+
+def upload_clips(clips, report):
+    for clip in clips:
+        if clip["path"]:
+            report("uploading", f"Video for image {clip['label']} is already available, skipping upload and generation")
+    pending = [clip for clip in clips if clip["path"] is None]
+    if not pending:
+        return
+
+    # All remaining images upload at once on the shared pool
+    def report_progress(index, done, total):
+        report("uploading", f"Got Image URL for image {pending[index]['label']} ({done}/{total})")
+    uploaded_urls = uploads.upload_images([clip["image_path"] for clip in pending], on_progress=report_progress)
+    for clip, uploaded_url in zip(pending, uploaded_urls):
+        clip["image_url"] = uploaded_url
+
+
+def generate_clips(client, job_id, clips, report):
+    pending = [clip for clip in clips if clip["path"] is None and clip.get("image_url")]
+    if not pending:
+        return
+    submitted_at = {}
+    for clip in pending:
+        # Calling again for the same image and prompt maps onto the generation
+        # that was already submitted for this job
+        with metrics.stage("generate"):
+            clip["generation_id"] = generations.submit_generation(client, job_id, clip["image_url"],
+                                                                  clip["prompt"], ASPECT_RATIO, clip_cache.LUMA_MODEL)
+        # Generation durations are measured from here, not from when polling starts
+        submitted_at.setdefault(clip["generation_id"], time.monotonic())
+    report("generating", "Waiting for Luma videos to be generated...")
+
+    def report_ready(generation_id, video_url):
+        if video_url:
+            report("generating", "Luma video is ready! Getting the final video ready in a bit.")
+        else:
+            report("generating", "Video generation failed or did not finish in time.")
+
+    # Poll every generation of the job at once
+    generation_ids = list(dict.fromkeys(clip["generation_id"] for clip in pending))
+    with metrics.stage("poll", generations=len(generation_ids)):
+        video_urls = poller.poll_generations(client, generation_ids, on_ready=report_ready, submitted_at=submitted_at)
+    for clip in pending:
+        clip["video_url"] = video_urls.get(clip["generation_id"])
+
+
+def extract_url(asset_string):
+    asset_string = str(asset_string)
+    match = re.search(r"'(https?://[^']+)'", asset_string)
+    return match.group(1) if match else None
+
+
+def download_clips(clips, report):
+    # Finished generations are downloaded concurrently, straight into the clip cache
+    pending = []
+    for clip in clips:
+        asset_string = clip.get("video_url")
+        if clip["path"] or asset_string is None:
+            continue
+        url = extract_url(asset_string)
+        if url:
+            pending.append((clip, url))
+        else:
+            print(f"Failed to extract URL from: {asset_string}")
+
+    def fetch(clip, url):
+        stats = {}
+        def download(tmp_path):
+            stats.update(downloads.download_file(url, tmp_path))
+        return clip_cache.store(clip["key"], download), stats
+
+    def report_done(index, result, error):
+        clip = pending[index][0]
+        if error is not None:
+            print(f"Error downloading video: {error}")
+            return
+        clip["path"], stats = result
+        report("downloading", f"Downloaded video for image {clip['label']} ({downloads.format_stats(stats)})")
+
+    downloads.run_concurrently([lambda clip=clip, url=url: fetch(clip, url) for clip, url in pending],
+                               on_done=report_done)
+
+
+def get_video_info(file_path):
+    return video_info.get_video_info(file_path)
+
+
+# Encoders used to bring an odd clip in line with the rest of the job
+STREAM_ENCODERS = {"h264": "libx264", "hevc": "libx265", "vp9": "libvpx-vp9", "av1": "libaom-av1"}
+
+
+def stream_signature(info):
+    # Clips with the same signature can be joined by the concat demuxer without re-encoding
+    return (info['codec'], info['width'], info['height'], info['pix_fmt'], info['fps'], info['time_base'])
+
+
+def encoder_options(encoder, profile):
+    settings = ENCODER_PROFILES[profile]
+    options = {"vcodec": encoder, "threads": settings["threads"], "g": settings["gop"]}
+    if encoder in ("libx264", "libx265"):
+        options.update(preset=settings["preset"], crf=settings["crf"])
+    return options
+
+
+def run_ffmpeg(stream):
+    try:
+        with metrics.call("ffmpeg"):
+            ffmpeg.run(stream, overwrite_output=True, capture_stderr=True)
+    except ffmpeg.Error as e:
+        stderr = e.stderr.decode() if e.stderr else ""
+        raise RuntimeError(f"FFmpeg error: {stderr or e}") from e
+
+
+def concat_copy(video_files, output_path):
+    # Concat demuxer with stream copy: no decoding, just remuxing the packets
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as list_file:
+        for file in video_files:
+            escaped = os.path.abspath(file).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+    try:
+        stream = ffmpeg.input(list_file.name, format='concat', safe=0).video
+        run_ffmpeg(stream.output(output_path, c='copy', **OUTPUT_OPTIONS))
+    finally:
+        os.remove(list_file.name)
+
+
+def conform_clip(file, reference, output_path, profile):
+    # Re-encodes one clip to the reference clip's codec, size, pixel format,
+    # frame rate and timebase so it can be stream-copied alongside the others
+    stream = (
+        ffmpeg
+        .input(file)
+        .video
+        .filter('scale', reference['width'], reference['height'])
+        .output(output_path, pix_fmt=reference['pix_fmt'], r=reference['fps'],
+                video_track_timescale=reference['time_base'].split('/')[-1],
+                **encoder_options(STREAM_ENCODERS[reference['codec']], profile))
+    )
+    run_ffmpeg(stream)
+
+
+def concat_reencode(video_files, video_infos, output_path, profile):
+    # Determine target resolution (use the smallest width and height)
+    target_width = min(info['width'] for info in video_infos)
+    target_height = min(info['height'] for info in video_infos)
+
+    # Create a list to hold input files
+    inputs = []
+    for file in video_files:
+        # Resize video to target resolution
+        input_video = (
+            ffmpeg
+            .input(file)
+            .filter('scale', target_width, target_height)
+            # concat refuses inputs whose sample aspect ratios differ
+            .filter('setsar', 1)
+        )
+        inputs.append(input_video)
+
+    # Concatenate videos
+    joined = ffmpeg.concat(*inputs)
+
+    # Output to file
+    run_ffmpeg(ffmpeg.output(joined, output_path, pix_fmt='yuv420p',
+                             **encoder_options("libx264", profile), **OUTPUT_OPTIONS))
+
+
+def stitch_report(output_path, video_infos, profile, reencoded, seconds):
+    # speed is seconds of video produced per wall clock second
+    duration = sum(info['duration'] for info in video_infos)
+    return {
+        "output_path": output_path,
+        "profile": profile,
+        "clips": len(video_infos),
+        "reencoded": reencoded,
+        "seconds": seconds,
+        "speed": duration / seconds if seconds else 0.0,
+        "bytes": os.path.getsize(output_path),
+    }
+
+
+def format_stitch_report(stats):
+    return (f"{stats['reencoded']} of {stats['clips']} clips re-encoded with the {stats['profile']} profile, "
+            f"{stats['seconds']:.1f}s at {stats['speed']:.1f}x realtime, {stats['bytes'] / 1e6:.1f} MB")
+
+
+def stitch_videos(video_files, output_path, profile=None, on_streaming=None):
+    # on_streaming() is called right before the final ffmpeg run starts
+    # writing the .part file that media_server.py streams to viewers
+    profile = profile or DEFAULT_PROFILE
+    started = time.perf_counter()
+    # Get info for all videos
+    with metrics.stage("probe", clips=len(video_files)):
+        video_infos = [get_video_info(file) for file in video_files]
+
+    # The most common format wins; only clips that differ from it are re-encoded
+    signatures = [stream_signature(info) for info in video_infos]
+    reference_signature = max(signatures, key=signatures.count)
+    reference = video_infos[signatures.index(reference_signature)]
+    reencoded = sum(signature != reference_signature for signature in signatures)
+    # A full re-encode is written under a .part name and renamed once
+    # complete; media_server.py streams the .part file to viewers meanwhile.
+    # The stream copy takes well under a second, so it goes to a scratch file
+    # instead: if it fails, nobody has been streaming a file that the
+    # re-encode then starts over.
+    part_path = media_server.partial_path(output_path)
+
+    def reencode_all():
+        if on_streaming:
+            on_streaming()
+        concat_reencode(video_files, video_infos, part_path, profile)
+        os.replace(part_path, output_path)
+
+    with metrics.stage("encode", profile=profile) as encode_span:
+        try:
+            if reference['codec'] not in STREAM_ENCODERS or not all(reference_signature):
+                reencode_all()
+                reencoded = len(video_files)
+            else:
+                # Scratch files stay next to the output so the rename is atomic
+                with tempfile.TemporaryDirectory(prefix="stitch-", dir=os.path.dirname(output_path) or None) as work_dir:
+                    conformed = []
+                    for i, (file, signature) in enumerate(zip(video_files, signatures)):
+                        if signature != reference_signature:
+                            conformed_path = os.path.join(work_dir, f"conformed_{i}.mp4")
+                            conform_clip(file, reference, conformed_path, profile)
+                            file = conformed_path
+                        conformed.append(file)
+                    copy_path = os.path.join(work_dir, "stitched.mp4")
+                    try:
+                        concat_copy(conformed, copy_path)
+                        os.replace(copy_path, output_path)
+                    except RuntimeError as e:
+                        print(f"Stream copy failed, re-encoding instead: {e}")
+                        reencode_all()
+                        reencoded = len(video_files)
+            encode_span["reencoded"] = reencoded
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    stats = stitch_report(output_path, video_infos, profile, reencoded, time.perf_counter() - started)
+    print(f"Stitched video saved as {output_path} ({format_stitch_report(stats)})")
+    return stats
+
+
+def run_job(job_id, payload, report):
+    # payload: {"image_paths": [...], "prompts": [...], "labels": [...],
+    #           "profile": optional ENCODER_PROFILES name}
+    # The video is written to the job's own workspace, workspaces.output_path(job_id)
+    # A bad profile fails the job here, before anything is paid for
+    profile = check_profile(payload.get("profile") or DEFAULT_PROFILE)
+    with metrics.stage("plan"):
+        clips = plan_clips(payload["image_paths"], payload["prompts"], payload.get("labels"))
+    if len(clips) < 2:
+        raise ValueError("Select at least 2 images to create a video.")
+
+    report("uploading", "Preparing images")
+    with metrics.stage("upload"):
+        upload_clips(clips, report)
+    if any(clip["path"] is None for clip in clips):
+        report("generating", "Got all image URLs, now moving on to generating Luma videos")
+        generate_clips(clients.luma(), job_id, clips, report)
+        with metrics.stage("download"):
+            download_clips(clips, report)
+
+    # Clips in selection order, whether cached or freshly downloaded
+    video_files = [clip["path"] for clip in clips if clip["path"]]
+    if len(video_files) < 2:
+        raise RuntimeError("Not enough videos were successfully downloaded to stitch.")
+    # "stitching" tells the page a video file is there to play, so it is only
+    # reported once one is about to be written
+    report("assembling", "Putting the clips together")
+    output_path = workspaces.create(job_id)
+
+    def on_streaming():
+        report("stitching", "Stitching the final video")
+
+    with metrics.stage("stitch"):
+        stats = stitch_videos(video_files, output_path, profile, on_streaming)
+    report("stitching", f"Stitched the final video ({format_stitch_report(stats)})")
+    return {"output_path": output_path, "stitch": stats}
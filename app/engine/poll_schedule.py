@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import random
+import threading
+from collections import deque
+
+from . import metrics
+
+# Decides when to check on a Luma generation next. Observed generation
+# durations are kept on disk; polling is sparse before the usual completion
+# window, dense inside it and backs off after it, with jitter and a hard
+# deadline. Each detection also records how late it probably was.
+HISTORY_PATH = os.environ.get("POLL_HISTORY_PATH", "../.cache/generation_durations.json")
+HISTORY_SIZE = 200
+MIN_SAMPLES = 5
+# Completion window used until enough durations have been observed
+DEFAULT_WINDOW = (20.0, 90.0)
+DENSE_INTERVAL = float(os.environ.get("POLL_DENSE_INTERVAL", "2"))
+SPARSE_INTERVAL = float(os.environ.get("POLL_SPARSE_INTERVAL", "15"))
+MAX_INTERVAL = float(os.environ.get("POLL_MAX_INTERVAL", "30"))
+DEADLINE = float(os.environ.get("POLL_DEADLINE", "600"))
+JITTER = 0.15
+
+_lock = threading.Lock()
+_stats = {"detected": 0, "expired": 0, "polls": 0, "detection_latency_total": 0.0, "detection_latency_max": 0.0}
+
+
+def _load_history():
+    try:
+        with open(HISTORY_PATH, "r") as f:
+            return deque((float(d) for d in json.load(f)), maxlen=HISTORY_SIZE)
+    except (OSError, ValueError, TypeError):
+        return deque(maxlen=HISTORY_SIZE)
+
+
+_history = _load_history()
+
+
+def _save_history(durations):
+    try:
+        os.makedirs(os.path.dirname(HISTORY_PATH) or ".", exist_ok=True)
+        tmp_path = f"{HISTORY_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(durations, f)
+        os.replace(tmp_path, HISTORY_PATH)
+    except OSError as e:
+        print(f"Could not save generation durations: {e}")
+
+
+def record_duration(seconds):
+    with _lock:
+        _history.append(seconds)
+        durations = list(_history)
+    _save_history(durations)
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def expected_window():
+    # (early, late): roughly the 10th and 90th percentile of past durations
+    with _lock:
+        durations = sorted(_history)
+    if len(durations) < MIN_SAMPLES:
+        return DEFAULT_WINDOW
+    return _percentile(durations, 0.1), _percentile(durations, 0.9)
+
+
+def _jittered(delay):
+    return delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class PollSchedule:
+    def __init__(self, deadline=DEADLINE, submitted_at=None):
+        # Elapsed time counts from submission (time.monotonic()) when known, so
+        # polling that starts late, after a callback wait, still records true
+        # durations; the deadline still allows `deadline` seconds of polling
+        now = time.monotonic()
+        self.started_at = now if submitted_at is None else submitted_at
+        self.deadline = deadline + (now - self.started_at)
+        self.early, self.late = expected_window()
+        self.last_check = None
+        self.backoff = DENSE_INTERVAL
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def not_ready(self):
+        self.last_check = self.elapsed()
+        with _lock:
+            _stats["polls"] += 1
+
+    def next_delay(self):
+        # Seconds until the next status check, or None once the deadline passed
+        elapsed = self.elapsed()
+        remaining = self.deadline - elapsed
+        if remaining <= 0:
+            with _lock:
+                _stats["expired"] += 1
+            return None
+        if elapsed < self.early:
+            # Sleep towards the start of the window, at most SPARSE_INTERVAL at a time
+            delay = min(SPARSE_INTERVAL, max(DENSE_INTERVAL, self.early - elapsed))
+        elif elapsed <= self.late:
+            delay = DENSE_INTERVAL
+        else:
+            self.backoff = min(self.backoff * 2, MAX_INTERVAL)
+            delay = self.backoff
+        return min(_jittered(delay), remaining)
+
+    def ready(self):
+        # The clip finished somewhere between the previous check and this one
+        detected_at = self.elapsed()
+        if self.last_check is None:
+            # Already done at the first check (e.g. a reused generation); nothing to learn
+            detection_latency = 0.0
+        else:
+            detection_latency = (detected_at - self.last_check) / 2
+            record_duration(detected_at - detection_latency)
+        with _lock:
+            _stats["polls"] += 1
+            _stats["detected"] += 1
+            _stats["detection_latency_total"] += detection_latency
+            _stats["detection_latency_max"] = max(_stats["detection_latency_max"], detection_latency)
+        if self.last_check is not None:
+            metrics.observe("detection", "poll", detection_latency)
+        return detection_latency
+
+
+def schedule_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats["detection_latency_mean"] = stats["detection_latency_total"] / stats["detected"] if stats["detected"] else 0.0
+    stats["window"] = expected_window()
+    return stats
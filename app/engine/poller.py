@@ -0,0 +1,79 @@
+import asyncio
+
+from . import poll_schedule
+from . import callbacks
+from . import metrics
+
+# Waits on many Luma generations at once. Every in-flight generation is polled
+# from a single event loop; status checks run concurrently (the sync client is
+# called on worker threads) and each clip resolves as soon as its assets show
+# up, so a job waits for its slowest generation rather than the sum of all.
+# When to check is decided by poll_schedule from past generation durations.
+# In callback mode the job first waits for Luma's notification and only
+# polls if none arrives in time.
+
+
+def get_generation(client, generation_id):
+    with metrics.call("luma.get"):
+        return client.generations.get(id=generation_id)
+
+
+def wait_for_callback(generation_id):
+    with metrics.call("luma.callback_wait"):
+        return callbacks.wait_for_generation(generation_id)
+
+
+async def poll_generation(client, generation_id, deadline=poll_schedule.DEADLINE, submitted_at=None):
+    if callbacks.enabled():
+        generation = await asyncio.to_thread(wait_for_callback, generation_id)
+        if generation is not None:
+            if generation.get("state") == "completed" and generation.get("assets"):
+                return generation["assets"]
+            print(f"Generation {generation_id} failed: {generation.get('failure_reason')}")
+            return None
+        print(f"No callback for generation {generation_id}, falling back to polling")
+
+    schedule = poll_schedule.PollSchedule(deadline, submitted_at)
+    while True:
+        generation = await asyncio.to_thread(get_generation, client, generation_id)
+        if generation.assets:
+            schedule.ready()
+            return generation.assets
+        if getattr(generation, "state", None) == "failed":
+            print(f"Generation {generation_id} failed: {getattr(generation, 'failure_reason', None)}")
+            return None
+        schedule.not_ready()
+        delay = schedule.next_delay()
+        if delay is None:
+            return None
+        await asyncio.sleep(delay)
+
+
+async def wait_for_generations(client, generation_ids, on_ready=None, submitted_at=None, **poll_options):
+    # Returns {generation_id: assets or None}. on_ready(generation_id, assets)
+    # is called on the loop's thread in completion order. submitted_at maps
+    # generation ids to their time.monotonic() submission time.
+    submitted_at = submitted_at or {}
+
+    async def tagged(generation_id):
+        try:
+            return generation_id, await poll_generation(client, generation_id,
+                                                        submitted_at=submitted_at.get(generation_id), **poll_options)
+        except Exception as e:
+            print(f"Polling generation {generation_id} failed: {e}")
+            return generation_id, None
+
+    results = {}
+    for next_done in asyncio.as_completed([tagged(generation_id) for generation_id in generation_ids]):
+        generation_id, assets = await next_done
+        results[generation_id] = assets
+        if on_ready:
+            on_ready(generation_id, assets)
+    return results
+
+
+def poll_generations(client, generation_ids, on_ready=None, submitted_at=None, **poll_options):
+    # Blocking entry point for the Streamlit script thread
+    if not generation_ids:
+        return {}
+    return asyncio.run(wait_for_generations(client, generation_ids, on_ready, submitted_at, **poll_options))
@@ -0,0 +1,31 @@
+import threading
+
+# The small HTTP servers the engine runs next to Streamlit or a worker
+# (thumbnail assets, media, Luma callbacks, metrics) are started once per
+# process on first use, each on a daemon thread. A server whose port is
+# already taken stays off for the life of the process; most likely another
+# process on the host serves it.
+_servers = {}
+_lock = threading.Lock()
+
+
+def ensure_server(name, make_server, port):
+    # The running server, or None when it couldn't be started
+    with _lock:
+        if name not in _servers:
+            try:
+                server = make_server()
+            except OSError as e:
+                print(f"{name} not started on port {port}: {e}")
+                server = None
+            else:
+                thread = threading.Thread(target=server.serve_forever, name=name, daemon=True)
+                thread.start()
+            _servers[name] = server
+        return _servers[name]
+
+
+def failed(name):
+    # True once starting the server was tried and failed in this process
+    with _lock:
+        return name in _servers and _servers[name] is None
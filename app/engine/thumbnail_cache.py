@@ -0,0 +1,218 @@
+import os
+import io
+import base64
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import asset_server
+from . import clip_cache
+
+# Two tier cache for gallery thumbnails: an in-process LRU shared by every
+# session and page, backed by JPEG files on disk that survive restarts.
+CACHE_DIR = os.environ.get("THUMBNAIL_CACHE_DIR", "../.cache/thumbnails")
+MEMORY_ENTRIES = int(os.environ.get("THUMBNAIL_CACHE_ENTRIES", "256"))
+# Output of build_thumbnails.py; when present it is consulted before the cache
+IMAGES_DIR = os.environ.get("IMAGES_DIR", "../images")
+BUILD_DIR = os.environ.get("THUMBNAIL_BUILD_DIR", "../build/thumbnails")
+MANIFEST_NAME = "manifest.json"
+
+# Every thumbnail size the pages ask for, so the build step can pre-render them
+THUMBNAIL_SIZES = [(520, 310)]
+
+# Speed/quality tiers. "draft" lets the JPEG decoder scale by 1/2, 1/4 or 1/8
+# while decoding, so most of the source pixels are never decompressed; the
+# final resample then brings the reduced image to the exact target size.
+QUALITY_TIERS = {
+    "fast": {"draft": True, "resample": "BILINEAR", "reducing_gap": None},
+    "balanced": {"draft": True, "resample": "LANCZOS", "reducing_gap": 2.0},
+    "best": {"draft": False, "resample": "LANCZOS", "reducing_gap": None},
+}
+DEFAULT_QUALITY = os.environ.get("THUMBNAIL_QUALITY", "balanced")
+
+# Bounded pool shared by all sessions; PIL releases the GIL while decoding
+WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", str(min(4, os.cpu_count() or 1))))
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="thumbnail")
+
+# "inline" embeds thumbnails as base64 data URIs, "static" writes them once to
+# the asset server directory and hands out content hashed, cacheable URLs;
+# "static" needs a public ASSET_BASE_URL and falls back to "inline" without one
+DELIVERY = os.environ.get("THUMBNAIL_DELIVERY", "inline")
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+_stats = {"memory_hits": 0, "manifest_hits": 0, "disk_hits": 0, "misses": 0}
+# cache key -> published asset name, so reruns skip hashing and disk checks
+_published = {}
+
+
+def size_label(width, height):
+    return f"{width}x{height}"
+
+
+def load_manifest(build_dir=BUILD_DIR):
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": 1, "images": {}}
+
+
+_manifest = load_manifest()
+
+
+def cache_key(image_path, width, height, quality=DEFAULT_QUALITY):
+    # Path, mtime and size identify the source; an edited file gets a new key
+    file_stat = os.stat(image_path)
+    raw = f"{os.path.abspath(image_path)}|{file_stat.st_mtime_ns}|{file_stat.st_size}|{width}x{height}|{quality}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def render_thumbnail(image_path, width, height, quality=DEFAULT_QUALITY):
+    tier = QUALITY_TIERS[quality]
+    # PIL is only needed when a thumbnail isn't already cached or pre-built
+    from PIL import Image
+    img = Image.open(image_path)
+    if tier["draft"]:
+        # No-op for formats other than JPEG
+        img.draft("RGB", (width, height))
+    resized_img = img.resize((width, height), resample=Image.Resampling[tier["resample"]], reducing_gap=tier["reducing_gap"])
+    if resized_img.mode != "RGB":
+        resized_img = resized_img.convert("RGB")
+    img_byte_arr = io.BytesIO()
+    resized_img.save(img_byte_arr, format='JPEG')
+    return img_byte_arr.getvalue()
+
+
+def _remember(key, data):
+    with _lock:
+        _memory[key] = data
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _read_manifest(image_path, width, height, quality):
+    if _manifest.get("quality", DEFAULT_QUALITY) != quality:
+        return None
+    name = os.path.relpath(os.path.abspath(image_path), os.path.abspath(IMAGES_DIR))
+    entry = _manifest["images"].get(name.replace(os.sep, "/"))
+    if entry is None:
+        return None
+    thumbnail = entry["thumbnails"].get(size_label(width, height))
+    if thumbnail is None:
+        return None
+    try:
+        # Compare content, not size: a same-size edit after the last build
+        # must not get the old thumbnail. A hit is kept in the memory tier
+        # under the mtime keyed cache key, so each source is hashed once.
+        if os.stat(image_path).st_size != entry["bytes"] or clip_cache.file_hash(image_path) != entry["sha256"]:
+            return None
+        with open(os.path.join(BUILD_DIR, thumbnail), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _disk_path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.jpg")
+
+
+def _read_disk(key):
+    try:
+        with open(_disk_path(key), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_disk(key, data):
+    path = _disk_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so other processes never read half a JPEG
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write thumbnail cache entry {path}: {e}")
+
+
+def get_thumbnail(image_path, width, height, quality=None):
+    quality = quality or DEFAULT_QUALITY
+    key = cache_key(image_path, width, height, quality)
+
+    with _lock:
+        data = _memory.get(key)
+        if data is not None:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return data
+
+    data = _read_manifest(image_path, width, height, quality)
+    if data is not None:
+        with _lock:
+            _stats["manifest_hits"] += 1
+        _remember(key, data)
+        return data
+
+    data = _read_disk(key)
+    if data is not None:
+        with _lock:
+            _stats["disk_hits"] += 1
+        _remember(key, data)
+        return data
+
+    with _lock:
+        _stats["misses"] += 1
+    data = render_thumbnail(image_path, width, height, quality)
+    _write_disk(key, data)
+    _remember(key, data)
+    return data
+
+
+def publish_thumbnail(image_path, width, height, quality=None):
+    quality = quality or DEFAULT_QUALITY
+    key = cache_key(image_path, width, height, quality)
+    with _lock:
+        name = _published.get(key)
+    if name is not None:
+        return name
+
+    data = get_thumbnail(image_path, width, height, quality)
+    name = f"thumbnails/{hashlib.sha256(data).hexdigest()[:20]}.jpg"
+    path = asset_server.asset_path(name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    with _lock:
+        _published[key] = name
+    return name
+
+
+def get_thumbnail_source(image_path, width, height, quality=None):
+    # Something st.image accepts: a data URI or a URL on the asset server
+    if DELIVERY == "static" and asset_server.enabled():
+        asset_server.ensure_server()
+        return asset_server.asset_url(publish_thumbnail(image_path, width, height, quality))
+    data = get_thumbnail(image_path, width, height, quality)
+    return f"data:image/jpeg;base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def get_thumbnail_sources(image_paths, width, height, quality=None):
+    # Whole grid on the shared pool, in the order of image_paths
+    return list(_executor.map(lambda image_path: get_thumbnail_source(image_path, width, height, quality), image_paths))
+
+
+def cache_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["memory_entries"] = len(_memory)
+    return stats
+
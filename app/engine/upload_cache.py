@@ -0,0 +1,91 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+from . import clients
+
+# Maps the sha256 of uploaded image bytes to the CDN secure_url returned for
+# them, so the curated gallery images are uploaded once rather than on every
+# Submit. Shared by all sessions and processes on the host through SQLite.
+# Entries are keyed per upload target (API host and cloud name), so URLs from
+# a fake endpoint are never handed out once the real one is configured.
+CACHE_PATH = os.environ.get("UPLOAD_CACHE_PATH", "../.cache/uploads.sqlite3")
+# Check with a HEAD request that a cached URL still resolves before reusing it
+VALIDATE = os.environ.get("UPLOAD_CACHE_VALIDATE", "0") == "1"
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stale": 0}
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "sha256 TEXT PRIMARY KEY, secure_url TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+
+def content_hash(image_bytes, target=""):
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    if not target:
+        return digest
+    return hashlib.sha256(f"{target}|{digest}".encode("utf-8")).hexdigest()
+
+
+def lookup(digest):
+    row = _connection().execute("SELECT secure_url FROM uploads WHERE sha256 = ?", (digest,)).fetchone()
+    return row[0] if row else None
+
+
+def store(digest, secure_url):
+    conn = _connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO uploads (sha256, secure_url, created_at) VALUES (?, ?, ?)",
+            (digest, secure_url, time.time()),
+        )
+
+
+def url_exists(url):
+    import requests
+    try:
+        response = clients.http_session().head(url, allow_redirects=True, timeout=clients.HTTP_TIMEOUT)
+        return response.status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def cached_upload(image_bytes, upload, validate=None, target=""):
+    # upload(image_bytes) -> secure_url is only called on a miss
+    validate = VALIDATE if validate is None else validate
+    digest = content_hash(image_bytes, target)
+    secure_url = lookup(digest)
+    if secure_url is not None:
+        if not validate or url_exists(secure_url):
+            _count("hits")
+            return secure_url
+        _count("stale")
+
+    _count("misses")
+    secure_url = upload(image_bytes)
+    store(digest, secure_url)
+    return secure_url
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats)
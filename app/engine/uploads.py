@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import clients
+from . import metrics
+from . import upload_cache
+
+# Credentials are passed with every upload instead of through the global
+# cloudinary.config(), so pages re-running their module code can never change
+# the configuration underneath an upload running on another thread.
+CLOUDINARY_CREDENTIALS = {
+    "cloud_name": os.environ.get("CLOUDINARY_CLOUD_NAME"),
+    "api_key": os.environ.get("CLOUDINARY_API_KEY"),
+    "api_secret": os.environ.get("CLOUDINARY_API_SECRET"),
+}
+# Alternative API host, e.g. fake_services.py for offline benchmarks
+if os.environ.get("CLOUDINARY_UPLOAD_PREFIX"):
+    CLOUDINARY_CREDENTIALS["upload_prefix"] = os.environ["CLOUDINARY_UPLOAD_PREFIX"]
+
+# Where uploads go, part of the upload cache key
+UPLOAD_TARGET = "|".join([
+    CLOUDINARY_CREDENTIALS.get("upload_prefix") or "https://api.cloudinary.com",
+    CLOUDINARY_CREDENTIALS["cloud_name"] or "",
+])
+
+# Bounded pool shared by every session in the process
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "4"))
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+
+
+def _upload_to_cloudinary(image_bytes):
+    with metrics.call("cloudinary.upload", bytes=len(image_bytes)):
+        result = clients.cloudinary_uploader().upload(image_bytes, **CLOUDINARY_CREDENTIALS)
+    return result['secure_url']
+
+
+def upload_to_cloudinary(image_bytes):
+    # Identical bytes were already uploaded once; reuse that secure_url
+    return upload_cache.cached_upload(image_bytes, _upload_to_cloudinary, target=UPLOAD_TARGET)
+
+
+def upload_many(images, on_progress=None):
+    # images are byte strings or callables returning them (read on the worker).
+    # Returns secure_urls in input order. on_progress(index, done, total) runs on
+    # the calling thread, so it may update the Streamlit UI.
+    def upload(image):
+        image_bytes = image() if callable(image) else image
+        return upload_to_cloudinary(image_bytes)
+
+    futures = {_executor.submit(metrics.bind_context(upload), image): index for index, image in enumerate(images)}
+    urls = [None] * len(futures)
+    for done, future in enumerate(as_completed(futures), start=1):
+        index = futures[future]
+        urls[index] = future.result()
+        if on_progress:
+            on_progress(index, done, len(futures))
+    return urls
+
+
+def read_image_bytes(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+def upload_images(image_paths, on_progress=None):
+    return upload_many([lambda path=path: read_image_bytes(path) for path in image_paths], on_progress)
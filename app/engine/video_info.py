@@ -0,0 +1,227 @@
+import os
+import struct
+import threading
+from fractions import Fraction
+from collections import OrderedDict
+
+from . import clip_cache
+from . import metrics
+
+# Reads width, height, duration, codec, pixel format, frame rate and timebase
+# straight from the moov box of an MP4, without spawning ffprobe or decoding a
+# frame. Anything the parser can't vouch for goes to ffprobe instead.
+MEMORY_ENTRIES = int(os.environ.get("VIDEO_INFO_CACHE_ENTRIES", "512"))
+
+SAMPLE_ENTRY_CODECS = {
+    b"avc1": "h264", b"avc3": "h264",
+    b"hvc1": "hevc", b"hev1": "hevc",
+    b"vp09": "vp9", b"av01": "av1", b"mp4v": "mpeg4",
+}
+CHROMA_FORMATS = {0: "gray", 1: "yuv420p", 2: "yuv422p", 3: "yuv444p"}
+CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+# file hash -> info, and (path, size, mtime) -> file hash so a file that
+# hasn't changed isn't hashed again
+_memory = OrderedDict()
+_hashes = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "parsed": 0, "ffprobe": 0}
+
+
+def iter_boxes(data, offset=0, end=None):
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def read_moov(file_path):
+    # Skips over mdat without reading it, wherever the moov box sits
+    with open(file_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            size, box_type = struct.unpack_from(">I4s", header)
+            header_size = 8
+            if size == 1:
+                size = struct.unpack_from(">Q", header, 8)[0]
+                header_size = 16
+            elif size == 0:
+                size = file_size - offset
+            if size < header_size:
+                return None
+            if box_type == b"moov":
+                f.seek(offset)
+                return f.read(size)
+            offset += size
+    return None
+
+
+def find_boxes(data, start, end, found):
+    for box_type, body, box_end in iter_boxes(data, start, end):
+        if box_type in CONTAINERS:
+            find_boxes(data, body, box_end, found)
+        else:
+            found.setdefault(box_type, (body, box_end))
+    return found
+
+
+def parse_mdhd(data, body):
+    version = data[body]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, body + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, body + 12)
+    return timescale, duration
+
+
+def parse_pix_fmt(codec, data, config):
+    # Chroma format and bit depth from the decoder configuration record
+    if config is None:
+        return None
+    body, end = config
+    if codec == "h264":
+        profile = data[body + 1]
+        if profile in (66, 77, 88):
+            # Baseline, Main and Extended are always 8-bit 4:2:0
+            return "yuv420p"
+        # Every other profile (High, High 10/4:2:2/4:4:4, the SVC and MVC
+        # ones...) may carry chroma format and bit depth after the parameter
+        # sets; a record without them goes to ffprobe
+        offset = body + 5
+        for count_mask in (0x1F, 0xFF):
+            count = data[offset] & count_mask
+            offset += 1
+            for _ in range(count):
+                offset += 2 + struct.unpack_from(">H", data, offset)[0]
+        if offset + 2 > end:
+            return None
+        chroma, depth = data[offset] & 0x3, (data[offset + 1] & 0x7) + 8
+    elif codec == "hevc":
+        chroma, depth = data[body + 16] & 0x3, (data[body + 17] & 0x7) + 8
+    else:
+        return None
+    pix_fmt = CHROMA_FORMATS[chroma]
+    return pix_fmt if depth == 8 else f"{pix_fmt}{depth}le"
+
+
+def parse_track(data, start, end):
+    boxes = find_boxes(data, start, end, {})
+    if not {b"hdlr", b"mdhd", b"stsd", b"stts"} <= boxes.keys():
+        return None
+    hdlr_body = boxes[b"hdlr"][0]
+    if data[hdlr_body + 8:hdlr_body + 12] != b"vide":
+        return None
+
+    timescale, duration = parse_mdhd(data, boxes[b"mdhd"][0])
+    stsd_body, stsd_end = boxes[b"stsd"]
+    entry = stsd_body + 8
+    entry_size, entry_format = struct.unpack_from(">I4s", data, entry)
+    codec = SAMPLE_ENTRY_CODECS.get(entry_format)
+    width, height = struct.unpack_from(">HH", data, entry + 32)
+    config = find_boxes(data, entry + 86, entry + entry_size, {})
+    pix_fmt = parse_pix_fmt(codec, data, config.get(b"avcC") or config.get(b"hvcC"))
+
+    stts_body = boxes[b"stts"][0]
+    entry_count = struct.unpack_from(">I", data, stts_body + 4)[0]
+    deltas = [struct.unpack_from(">II", data, stts_body + 8 + i * 8) for i in range(entry_count)]
+    if not timescale or not duration or not deltas:
+        return None
+    # The delta most samples use; Luma clips are constant frame rate
+    sample_delta = max(deltas, key=lambda d: d[0])[1]
+    fps = Fraction(timescale, sample_delta)
+    return {
+        'width': width,
+        'height': height,
+        'duration': duration / timescale,
+        'codec': codec,
+        'pix_fmt': pix_fmt,
+        'fps': f"{fps.numerator}/{fps.denominator}",
+        'time_base': f"1/{timescale}",
+    }
+
+
+def parse_mp4(file_path):
+    # Info for the first video track, or None when ffprobe should take over
+    try:
+        moov = read_moov(file_path)
+        if moov is None:
+            return None
+        for box_type, body, box_end in iter_boxes(moov, 8):
+            if box_type == b"trak":
+                info = parse_track(moov, body, box_end)
+                if info is not None:
+                    return info if all(info.values()) else None
+    except (struct.error, IndexError, KeyError):
+        return None
+    return None
+
+
+def ffprobe_info(file_path):
+    import ffmpeg
+    with metrics.call("ffprobe"):
+        probe = ffmpeg.probe(file_path)
+    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    if video_stream is None:
+        raise ValueError(f"No video stream in {file_path}")
+    return {
+        'width': int(video_stream['width']),
+        'height': int(video_stream['height']),
+        'duration': float(video_stream['duration']),
+        'codec': video_stream.get('codec_name'),
+        'pix_fmt': video_stream.get('pix_fmt'),
+        'fps': video_stream.get('r_frame_rate'),
+        'time_base': video_stream.get('time_base'),
+    }
+
+
+def file_digest(file_path):
+    stat = os.stat(file_path)
+    stamp = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        digest = _hashes.get(stamp)
+    if digest is None:
+        digest = clip_cache.file_hash(file_path)
+        with _lock:
+            _hashes[stamp] = digest
+    return digest
+
+
+def get_video_info(file_path):
+    digest = file_digest(file_path)
+    with _lock:
+        info = _memory.get(digest)
+        if info is not None:
+            _memory.move_to_end(digest)
+            _stats["hits"] += 1
+            return dict(info)
+
+    info = parse_mp4(file_path)
+    source = "parsed"
+    if info is None:
+        info = ffprobe_info(file_path)
+        source = "ffprobe"
+    with _lock:
+        _stats[source] += 1
+        _memory[digest] = info
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+        if len(_hashes) > MEMORY_ENTRIES:
+            _hashes.clear()
+    return dict(info)
+
+
+def cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_memory))
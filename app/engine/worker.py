@@ -0,0 +1,128 @@
+import os
+import time
+import socket
+import argparse
+import threading
+import traceback
+
+from . import jobs
+from . import metrics
+from . import workspaces
+
+# Runs queued video jobs outside Streamlit, so a job survives reruns and
+# browser refreshes and the Streamlit server only enqueues and renders status.
+# Run from the app directory, as many processes as the host can take:
+#   python -m engine.worker --threads 2
+# With JOB_WORKER=inline the Streamlit process runs a worker thread itself,
+# which is handy for local development.
+IDLE_SLEEP = float(os.environ.get("WORKER_IDLE_SLEEP", "1"))
+INLINE = os.environ.get("JOB_WORKER") == "inline"
+
+_inline_started = False
+_inline_lock = threading.Lock()
+
+
+def run_one(worker_id):
+    # Claims and runs a single job; returns False when the queue was empty
+    job = jobs.claim(worker_id)
+    if job is None:
+        return False
+    job_id = job["id"]
+    print(f"[{worker_id}] running job {job_id}")
+
+    # Long stages (polling can take many minutes) don't report, so a timer keeps
+    # the job's heartbeat going; a job that another worker took over stops at
+    # its next progress report instead of paying for more generations
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=keep_alive, args=(job_id, worker_id, stop),
+                                 name=f"heartbeat-{job_id[:8]}", daemon=True)
+    heartbeat.start()
+
+    def report(stage, message=None):
+        if not jobs.report(job_id, worker_id, stage, message):
+            raise RuntimeError(f"Job {job_id} was handed to another worker")
+
+    # The pipeline pulls in the Luma SDK, ffmpeg and the HTTP stack; Streamlit
+    # pages import this module for ensure_inline_worker() and shouldn't pay for them
+    from . import generations
+    try:
+        # Inside the try: a bad STITCH_PROFILE fails the import, and so the job
+        from . import pipeline
+        # Every span recorded while the job runs carries its id
+        with metrics.job_context(job_id), metrics.stage("job"):
+            result = pipeline.run_job(job_id, job["payload"], report)
+    except Exception as e:
+        traceback.print_exc()
+        owned = jobs.fail(job_id, worker_id, e)
+    else:
+        owned = jobs.finish(job_id, worker_id, result)
+    finally:
+        stop.set()
+        generations.forget_job(job_id)
+    if not owned:
+        print(f"[{worker_id}] job {job_id} was taken over by another worker; result dropped")
+    # Make room right away rather than waiting for the janitor's next pass
+    workspaces.enforce_budget()
+    return True
+
+
+def keep_alive(job_id, worker_id, stop):
+    while not stop.wait(jobs.HEARTBEAT_INTERVAL):
+        try:
+            if not jobs.heartbeat(job_id, worker_id):
+                return
+        except Exception:
+            # A locked database is retried on the next beat
+            traceback.print_exc()
+
+
+def work_forever(worker_id):
+    while True:
+        try:
+            if not run_one(worker_id):
+                time.sleep(IDLE_SLEEP)
+        except Exception:
+            # Keep the worker alive through queue errors such as a locked database
+            traceback.print_exc()
+            time.sleep(IDLE_SLEEP)
+
+
+def start_threads(count, prefix):
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(target=work_forever, args=(f"{prefix}-{i}",), name=f"worker-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def ensure_inline_worker():
+    global _inline_started
+    if not INLINE:
+        return
+    with _inline_lock:
+        if not _inline_started:
+            start_threads(1, f"{socket.gethostname()}-{os.getpid()}-inline")
+            workspaces.ensure_janitor()
+            _inline_started = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued video jobs")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WORKER_THREADS", "2")),
+                        help="jobs this process runs at the same time")
+    # METRICS_PORT itself is taken by the Streamlit process
+    parser.add_argument("--metrics-port", type=int,
+                        default=int(os.environ.get("WORKER_METRICS_PORT", str(metrics.METRICS_PORT + 1))),
+                        help="port for the Prometheus /metrics endpoint, one per worker process")
+    args = parser.parse_args()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    print(f"Worker {prefix} started with {args.threads} thread(s)")
+    workspaces.ensure_janitor()
+    metrics.ensure_server(args.metrics_port)
+    for thread in start_threads(args.threads, prefix):
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import time
+import shutil
+import fnmatch
+import threading
+
+from . import jobs
+from . import clip_cache
+from . import media_server
+
+# Every job writes into its own directory under ../videos/jobs/<job_id>/, so
+# concurrent jobs on one host never overwrite each other's output. A janitor
+# keeps everything under the media directory within a byte budget by removing
+# the least recently used job workspaces. Files matching VIDEO_PINNED (the
+# sample videos by default), workspaces holding a .pinned marker and
+# workspaces of running jobs are never removed. The same pass keeps the clip
+# cache within its own budget, clip_cache.CLIP_CACHE_BUDGET.
+JOBS_DIR = os.environ.get("VIDEO_JOBS_DIR", os.path.join(media_server.MEDIA_DIR, "jobs"))
+OUTPUT_NAME = "stitched_video.mp4"
+DISK_BUDGET = int(os.environ.get("VIDEO_DISK_BUDGET", str(2 * 1024 ** 3)))
+PINNED = [pattern for pattern in os.environ.get("VIDEO_PINNED", "sample_*").split(",") if pattern]
+PIN_MARKER = ".pinned"
+JANITOR_INTERVAL = float(os.environ.get("JANITOR_INTERVAL", "60"))
+
+_janitor = None
+_janitor_lock = threading.Lock()
+_enforce_lock = threading.Lock()
+_stats = {"runs": 0, "evicted": 0, "freed_bytes": 0, "usage_bytes": 0}
+
+
+def workspace_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def output_path(job_id):
+    return os.path.join(workspace_dir(job_id), OUTPUT_NAME)
+
+
+def create(job_id):
+    os.makedirs(workspace_dir(job_id), exist_ok=True)
+    return output_path(job_id)
+
+
+def awaits_output(path):
+    # True for the output path of a job that is still running, which viewers
+    # may ask for before the stitcher has started writing it
+    job_id = os.path.basename(os.path.dirname(path))
+    if os.path.realpath(path) != os.path.realpath(output_path(job_id)):
+        return False
+    return jobs.is_active(jobs.get_job(job_id))
+
+
+def touch(job_id):
+    # Viewing a job's video makes it the most recently used
+    try:
+        os.utime(workspace_dir(job_id))
+    except FileNotFoundError:
+        pass
+
+
+def pin(job_id):
+    create(job_id)
+    open(os.path.join(workspace_dir(job_id), PIN_MARKER), "a").close()
+
+
+def is_pinned(path):
+    relative_path = os.path.relpath(path, media_server.MEDIA_DIR)
+    return any(fnmatch.fnmatch(os.path.basename(path), pattern) or fnmatch.fnmatch(relative_path, pattern)
+               for pattern in PINNED)
+
+
+def tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def evictable(job_id):
+    path = workspace_dir(job_id)
+    if os.path.exists(os.path.join(path, PIN_MARKER)) or is_pinned(path):
+        return False
+    names = os.listdir(path)
+    if any(is_pinned(os.path.join(path, name)) or name.endswith(media_server.PART_SUFFIX) for name in names):
+        return False
+    return not jobs.is_active(jobs.get_job(job_id))
+
+
+def enforce_budget(budget=None):
+    # Removes least recently used workspaces until the media directory fits
+    budget = DISK_BUDGET if budget is None else budget
+    with _enforce_lock:
+        evicted = _enforce_budget(budget)
+        clip_cache.enforce_budget()
+    return evicted
+
+
+def _enforce_budget(budget):
+    usage = tree_size(media_server.MEDIA_DIR)
+    evicted = []
+    if usage > budget and os.path.isdir(JOBS_DIR):
+        workspaces = []
+        for job_id in os.listdir(JOBS_DIR):
+            path = workspace_dir(job_id)
+            if os.path.isdir(path):
+                workspaces.append((os.path.getmtime(path), job_id))
+        for _, job_id in sorted(workspaces):
+            if usage <= budget:
+                break
+            if not evictable(job_id):
+                continue
+            size = tree_size(workspace_dir(job_id))
+            shutil.rmtree(workspace_dir(job_id), ignore_errors=True)
+            usage -= size
+            evicted.append(job_id)
+            _stats["freed_bytes"] += size
+    _stats["runs"] += 1
+    _stats["evicted"] += len(evicted)
+    _stats["usage_bytes"] = usage
+    if evicted:
+        print(f"Janitor removed {len(evicted)} workspace(s), {usage / 1e6:.1f} MB in use")
+    return evicted
+
+
+def run_janitor():
+    while True:
+        try:
+            enforce_budget()
+        except Exception as e:
+            # A workspace removed underneath us is retried on the next pass
+            print(f"Janitor error: {e}")
+        time.sleep(JANITOR_INTERVAL)
+
+
+def ensure_janitor():
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = threading.Thread(target=run_janitor, name="janitor", daemon=True)
+            _janitor.start()
+
+
+def janitor_stats():
+    return dict(_stats)
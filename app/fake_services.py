@@ -0,0 +1,376 @@
+import os
+import io
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-ins for the Luma and Cloudinary APIs, for reproducible latency
+# and throughput measurements without touching the live services. Run from
+# the app directory:
+#   python fake_services.py --generation-time 8:0.3 --latency upload=0.6:0.4
+# and point the app at it:
+#   LUMAAI_BASE_URL=http://localhost:8505/dream-machine/v1
+#   CLOUDINARY_UPLOAD_PREFIX=http://localhost:8505
+# Generated clips are synthetic MP4s rendered once with ffmpeg, or taken from
+# --clips-dir.
+FAKE_HOST = os.environ.get("FAKE_SERVICES_HOST", "0.0.0.0")
+FAKE_PORT = int(os.environ.get("FAKE_SERVICES_PORT", "8505"))
+LUMA_PREFIX = "/dream-machine/v1"
+CLIP_SIZE = (1360, 752)
+CLIP_SECONDS = 5
+MAX_STORED_IMAGES = 500
+
+
+class LogNormal:
+    # Latency distribution given by its median and log-space sigma, in seconds
+    def __init__(self, median, sigma=0.0):
+        self.median = median
+        self.sigma = sigma
+
+    @classmethod
+    def parse(cls, text):
+        median, _, sigma = text.partition(":")
+        return cls(float(median), float(sigma or 0))
+
+    def sample(self, rng):
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(rng.gauss(0, self.sigma)) if self.sigma else self.median
+
+
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate
+        # Room for at least one request, or rates below 1/s would never allow any
+        self.capacity = max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class FakeState:
+    def __init__(self, options):
+        self.options = options
+        self.rng = random.Random(options.seed)
+        self.rng_lock = threading.Lock()
+        self.latency = {name: LogNormal(0) for name in ("upload", "create", "get", "download")}
+        for spec in options.latency:
+            name, _, distribution = spec.partition("=")
+            self.latency[name] = LogNormal.parse(distribution)
+        self.generation_time = LogNormal.parse(options.generation_time)
+        self.buckets = {"luma": TokenBucket(options.rate_limit), "cloudinary": TokenBucket(options.rate_limit)}
+        self.clips = load_clips(options.clips_dir)
+        self.lock = threading.Lock()
+        self.generations = {}
+        self.images = {}
+        self.stats = {"uploads": 0, "creates": 0, "gets": 0, "downloads": 0, "rate_limited": 0, "failures": 0}
+
+    def random(self):
+        with self.rng_lock:
+            return self.rng.random()
+
+    def sample(self, name):
+        with self.rng_lock:
+            return self.latency[name].sample(self.rng)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+
+def render_clip(path, pattern):
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi",
+         "-i", f"{pattern}=size={CLIP_SIZE[0]}x{CLIP_SIZE[1]}:rate=24", "-t", str(CLIP_SECONDS),
+         "-c:v", "libx264", "-pix_fmt", "yuv420p", path],
+        check=True,
+    )
+
+
+def load_clips(clips_dir):
+    if clips_dir:
+        names = sorted(name for name in os.listdir(clips_dir) if name.endswith(".mp4"))
+        return {name: os.path.join(clips_dir, name) for name in names}
+    clips_dir = tempfile.mkdtemp(prefix="fake-clips-")
+    clips = {}
+    for i, pattern in enumerate(["testsrc2", "smptebars", "mandelbrot"]):
+        name = f"synthetic_{i}.mp4"
+        render_clip(os.path.join(clips_dir, name), pattern)
+        clips[name] = os.path.join(clips_dir, name)
+    return clips
+
+
+def iso_now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def base_url(self):
+        return self.server.base_url
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        return self.rfile.read(length) if length else b""
+
+    def inject(self, api, latency_name):
+        # Applies latency, rate limit and random failures; False if the request was rejected
+        time.sleep(self.state.sample(latency_name))
+        if not self.state.buckets[api].allow():
+            self.state.count("rate_limited")
+            self.send_json(429, {"detail": "Too many requests"})
+            return False
+        if self.state.random() < self.state.options.failure_rate:
+            self.state.count("failures")
+            self.send_json(500, {"detail": "Injected failure"})
+            return False
+        return True
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        parts = path.strip("/").split("/")
+        if path in (f"{LUMA_PREFIX}/generations", f"{LUMA_PREFIX}/generations/video"):
+            self.create_generation()
+        elif len(parts) == 4 and parts[0] == "v1_1" and parts[3] == "upload":
+            self.upload_image()
+        else:
+            self.read_body()
+            self.send_json(404, {"detail": "Not found"})
+
+    def do_GET(self):
+        self.get_resource(send_body=True)
+
+    def do_HEAD(self):
+        self.get_resource(send_body=False)
+
+    def get_resource(self, send_body):
+        path = self.path.split("?")[0]
+        if path.startswith(f"{LUMA_PREFIX}/generations/"):
+            self.get_generation(path.rsplit("/", 1)[1])
+        elif path.startswith("/images/"):
+            self.send_image(path.rsplit("/", 1)[1], send_body)
+        elif path.startswith("/clips/"):
+            self.send_clip(path.rsplit("/", 1)[1], send_body)
+        elif path == "/stats":
+            with self.state.lock:
+                self.send_json(200, dict(self.state.stats))
+        else:
+            self.send_json(404, {"detail": "Not found"})
+
+    def create_generation(self):
+        request = json.loads(self.read_body() or b"{}")
+        if not self.inject("luma", "create"):
+            return
+        self.state.count("creates")
+        generation_id = str(uuid.uuid4())
+        with self.state.rng_lock:
+            duration = self.state.generation_time.sample(self.state.rng)
+            fails = self.state.rng.random() < self.state.options.generation_failure_rate
+            clip = self.state.rng.choice(sorted(self.state.clips))
+        generation = {
+            "id": generation_id,
+            "generation_type": "video",
+            "state": "queued",
+            "failure_reason": None,
+            "created_at": iso_now(),
+            "assets": None,
+            "model": request.get("model"),
+            "request": request,
+            "ready_at": time.monotonic() + duration,
+            "final_state": "failed" if fails else "completed",
+            "clip": clip,
+        }
+        with self.state.lock:
+            self.state.generations[generation_id] = generation
+        if request.get("callback_url"):
+            timer = threading.Timer(duration, self.send_callback, args=(generation_id, request["callback_url"]))
+            timer.daemon = True
+            timer.start()
+        self.send_json(201, self.public_generation(generation))
+
+    def public_generation(self, generation):
+        generation = dict(generation)
+        if time.monotonic() >= generation["ready_at"]:
+            generation["state"] = generation["final_state"]
+            if generation["state"] == "completed":
+                generation["assets"] = {"video": f"{self.base_url()}/clips/{generation['clip']}"}
+            else:
+                generation["failure_reason"] = "Injected generation failure"
+        else:
+            generation["state"] = "dreaming"
+        for private in ("ready_at", "final_state", "clip"):
+            generation.pop(private)
+        return generation
+
+    def send_callback(self, generation_id, callback_url):
+        with self.state.lock:
+            generation = self.state.generations.get(generation_id)
+        if generation is None:
+            return
+        body = json.dumps(self.public_generation(generation)).encode("utf-8")
+        request = urllib.request.Request(callback_url, data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except OSError as e:
+            print(f"Callback to {callback_url} failed: {e}")
+
+    def get_generation(self, generation_id):
+        if not self.inject("luma", "get"):
+            return
+        self.state.count("gets")
+        with self.state.lock:
+            generation = self.state.generations.get(generation_id)
+        if generation is None:
+            self.send_json(404, {"detail": "Generation not found"})
+            return
+        self.send_json(200, self.public_generation(generation))
+
+    def upload_image(self):
+        body = self.read_body()
+        if not self.inject("cloudinary", "upload"):
+            return
+        self.state.count("uploads")
+        image_bytes = extract_file_field(self.headers.get("Content-Type", ""), body)
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        with self.state.lock:
+            self.state.images[digest] = image_bytes
+            while len(self.state.images) > MAX_STORED_IMAGES:
+                self.state.images.pop(next(iter(self.state.images)))
+        url = f"{self.base_url()}/images/{digest}.jpg"
+        self.send_json(200, {
+            "public_id": digest[:20],
+            "version": int(time.time()),
+            "resource_type": "image",
+            "format": "jpg",
+            "bytes": len(image_bytes),
+            "url": url,
+            "secure_url": url,
+        })
+
+    def send_image(self, name, send_body):
+        with self.state.lock:
+            image_bytes = self.state.images.get(name.split(".")[0])
+        if image_bytes is None:
+            self.send_json(404, {"detail": "Not found"})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(image_bytes)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(image_bytes)
+
+    def send_clip(self, name, send_body):
+        path = self.state.clips.get(name)
+        if path is None:
+            self.send_json(404, {"detail": "Not found"})
+            return
+        time.sleep(self.state.sample("download"))
+        self.state.count("downloads")
+        size = os.path.getsize(path)
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        if not send_body:
+            return
+        bandwidth = self.state.options.bandwidth
+        chunk_size = 64 * 1024
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                self.wfile.write(chunk)
+                if bandwidth:
+                    time.sleep(len(chunk) / bandwidth)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def extract_file_field(content_type, body):
+    # Pulls the "file" part out of Cloudinary's multipart upload
+    message = BytesParser(policy=HTTP).parse(io.BytesIO(f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body))
+    if not message.is_multipart():
+        return body
+    for part in message.iter_parts():
+        if part.get_param("name", header="content-disposition") == "file":
+            return part.get_payload(decode=True) or b""
+    return body
+
+
+def make_server(options):
+    # Render the synthetic clips before binding, so early clients get refused
+    # rather than accepted and left hanging until startup finishes
+    state = FakeState(options)
+    server = ThreadingHTTPServer((options.host, options.port), FakeRequestHandler)
+    server.daemon_threads = True
+    server.state = state
+    server.base_url = options.base_url or f"http://localhost:{options.port}"
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Luma and Cloudinary APIs with latency injection")
+    parser.add_argument("--host", default=FAKE_HOST)
+    parser.add_argument("--port", type=int, default=FAKE_PORT)
+    parser.add_argument("--base-url", help="URL clients reach this server on (default http://localhost:PORT)")
+    parser.add_argument("--latency", action="append", default=[], metavar="NAME=MEDIAN[:SIGMA]",
+                        help="lognormal latency in seconds for upload, create, get or download")
+    parser.add_argument("--generation-time", default="8:0.3", metavar="MEDIAN[:SIGMA]",
+                        help="lognormal time in seconds until a generation completes")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of API calls answered with 500")
+    parser.add_argument("--generation-failure-rate", type=float, default=0.0,
+                        help="fraction of generations that end in the failed state")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second per API, 0 for none")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="clip download bytes per second, 0 for none")
+    parser.add_argument("--clips-dir", help="serve these MP4s instead of rendering synthetic ones")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main():
+    options = parse_args()
+    server = make_server(options)
+    print(f"Fake services on {options.host}:{options.port} with {len(server.state.clips)} clips")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
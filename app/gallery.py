@@ -0,0 +1,172 @@
+import os
+import time
+import streamlit as st
+from engine import thumbnail_cache
+from engine import jobs
+from engine import worker
+from engine import media_server
+from engine import metrics
+from engine import workspaces
+from engine.events import EVENTS, PROMPTS
+
+# The gallery page shared by every event in engine/events.py. Pages under
+# pages/ only call render(<event name>).
+
+# How often the page re-reads the status of a running job
+JOB_REFRESH_SECONDS = 2
+# A job still queued after this long probably has no worker to run it
+QUEUED_NOTICE_SECONDS = 30
+
+def basic_setup(page_icon):
+    # Remove default header and footer
+    st.set_page_config(page_title="Dreamy Time Machine", page_icon=page_icon, layout="wide", initial_sidebar_state="collapsed")
+    # Custom CSS to remove default header and footer, and create the custom header
+    st.markdown("""
+        <style>
+        #MainMenu {visibility: hidden;}
+        footer {visibility: hidden;}
+        header {visibility: hidden;}
+        .custom-header {
+            position: fixed;
+            top: 0;
+            left: 0;
+            width: 100%;
+            background-color: #894028;
+            color: white;
+            text-align: center;
+            padding: 15px 0;
+            font-size: 24px;
+            font-weight: bold;
+            z-index: 999;
+        }
+        .block-container {
+            padding-top: 50px;
+        }
+        img {
+        border-radius: 20px;
+        }
+        </style>
+        """, unsafe_allow_html=True)
+
+
+def display_images(image_paths):
+    # Thumbnails for the whole grid are prepared up front on the shared pool, as
+    # data URIs or cacheable asset URLs depending on THUMBNAIL_DELIVERY
+    image_sources = thumbnail_cache.get_thumbnail_sources(image_paths, 520, 310)
+    # Display images in two rows with 3 images each
+    for row in range(2):
+        cols = st.columns(3)
+        for col in range(3):
+            idx = row * 3 + col
+            if idx < len(image_paths):
+                with cols[col]:
+                    st.image(image_sources[idx],caption=f"Image {idx+1}")
+
+
+def job_key(event_name):
+    # Session key for the event's job, so each gallery page tracks its own
+    return f"job_id_{event_name}"
+
+def submit_job(event_name, selected_images):
+    # The pipeline runs in engine/worker.py; the page only enqueues and shows status
+    image_paths = EVENTS[event_name]["images"]
+    job_id = jobs.enqueue({
+        "image_paths": [image_paths[int(image)-1] for image in selected_images],
+        "labels": selected_images,
+        "prompts": PROMPTS,
+    })
+    st.session_state[job_key(event_name)] = job_id
+    # Keep the job in the URL so a browser refresh picks it up again
+    st.query_params["job"] = job_id
+
+def current_job(event_name):
+    job_id = st.session_state.get(job_key(event_name)) or st.query_params.get("job")
+    return jobs.get_job(job_id) if job_id else None
+
+def show_video(path):
+    # Through the media server when it has a public address; otherwise
+    # Streamlit serves the file itself, which works wherever the page does
+    if media_server.enabled():
+        st.video(media_server.media_url(path))
+    elif os.path.exists(path):
+        st.video(path)
+    else:
+        st.error("This video is not available.")
+
+def show_job_status(job):
+    with st.expander("Updates", expanded=jobs.is_active(job)):
+        for message in job["messages"]:
+            st.write(message)
+    if job["status"] == jobs.QUEUED and time.time() - job["created_at"] > QUEUED_NOTICE_SECONDS:
+        st.warning("No worker has picked up this job yet. Start one with `python -m engine.worker` "
+                   "from the app directory, or run the app with JOB_WORKER=inline.")
+    if jobs.is_active(job) and job["stage"] == "stitching" and media_server.enabled():
+        # The stitched video streams from the media server while it is being
+        # written, so playback starts before the job has finished
+        st.video(media_server.media_url(workspaces.output_path(job["id"])))
+    elif jobs.is_active(job):
+        st.info(f"Your video is being prepared ({job['stage']})...")
+    elif job["status"] == jobs.DONE and os.path.exists(job["result"]["output_path"]):
+        workspaces.touch(job["id"])
+        show_video(job["result"]["output_path"])
+    elif job["status"] == jobs.DONE:
+        st.info("This video has been cleaned up to save space. Submit your selection again to recreate it.")
+    else:
+        st.error(f"Video generation failed: {job['error']}")
+
+def job_panel(event_name, was_active):
+    job = current_job(event_name)
+    if was_active and not jobs.is_active(job):
+        # One full rerun, so the panel is rebuilt without the refresh timer
+        st.rerun()
+    show_job_status(job)
+
+def show_job(event_name):
+    job = current_job(event_name)
+    if job is None:
+        return
+    active = jobs.is_active(job)
+    # While the job runs only this panel refreshes; the image grid above is
+    # left alone and a playing video isn't remounted
+    st.fragment(job_panel, run_every=JOB_REFRESH_SECONDS if active else None)(event_name, active)
+
+def render(event_name):
+    event = EVENTS[event_name]
+    basic_setup(event["page_icon"])
+    worker.ensure_inline_worker()
+    if media_server.enabled():
+        media_server.ensure_server()
+    # Thumbnail cache counters (and inline worker spans) live in this process
+    metrics.ensure_server()
+    st.markdown('<div class="custom-header">Dreamy Time Machine</div>', unsafe_allow_html=True)
+    st.subheader(event["title"])
+    display_images(event["images"])
+    image_options = [f"{i+1}" for i in range(len(event["images"]))]
+    selected_images = st.multiselect("Select up to 2 images to create a video:", image_options, max_selections=2)
+    if selected_images:
+        st.write("You selected:", ", ".join(selected_images))
+    col1, col2 = st.columns([1, 5.5])  # Adjust column widths
+
+    # Custom CSS to reduce button margin
+    st.markdown("""
+    <style>
+        .stButton > button {
+            margin-right: 0;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+    with col1:
+        submit_button = st.button("Submit Selection")
+    with col2:
+        sample_video_button = st.button("Sample Video")
+
+    if submit_button and len(selected_images) < 2:
+        # Checked here rather than by the worker, which may be minutes away
+        st.warning("Select 2 images to create a video.")
+    elif submit_button:
+        submit_job(event_name, selected_images)
+    show_job(event_name)
+
+    if sample_video_button:
+        show_video(event["sample_video"])
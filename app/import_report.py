@@ -0,0 +1,65 @@
+import os
+import re
+import sys
+import glob
+import argparse
+import subprocess
+
+# What each page costs to import on top of Streamlit itself, measured in a
+# fresh interpreter with python -X importtime. Run from the app directory:
+#   python import_report.py [--top 10] [main.py pages/oppenheimer.py ...]
+# A page is loaded the way Streamlit loads it, minus the __main__ guard, so
+# only its module level imports are timed.
+BASELINE = "streamlit"
+MARKER = "--- page imports ---"
+LOADER = """
+import sys, importlib.util
+import {baseline}
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+sys.path.insert(0, ".")
+spec = importlib.util.spec_from_file_location("page", {path!r})
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+"""
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$")
+
+
+def default_targets():
+    return ["main.py"] + sorted(glob.glob(os.path.join("pages", "*.py")))
+
+
+def measure(path):
+    # ({top level package: self time in us}, error or None) for everything the
+    # page imports that Streamlit hadn't already
+    code = LOADER.format(baseline=BASELINE, marker=MARKER, path=path)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    lines = result.stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    packages = {}
+    for line in lines:
+        match = LINE.match(line)
+        if match:
+            package = match.group(2).split(".")[0]
+            packages[package] = packages.get(package, 0) + int(match.group(1))
+    error = None
+    if result.returncode != 0:
+        error = next((line for line in reversed(lines) if line.strip() and not line.startswith("import time:")), "failed")
+    return packages, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import cost of each page beyond Streamlit")
+    parser.add_argument("targets", nargs="*", help="page scripts (default: main.py and pages/*.py)")
+    parser.add_argument("--top", type=int, default=10, help="heaviest packages to list per page")
+    args = parser.parse_args()
+    for path in args.targets or default_targets():
+        packages, error = measure(path)
+        total = sum(packages.values())
+        print(f"{path}: {total / 1000:.1f} ms beyond {BASELINE}" + (f"  (import failed: {error})" if error else ""))
+        for package, self_time in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {self_time / 1000:8.1f} ms  {package}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,6 @@
 import streamlit as st
-from PIL import Image
-import os
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
-
-# Configure Cloudinary
-cloudinary.config( 
-  cloud_name = os.environ.get("CLOUDINARY_CLOUD_NAME"), 
-  api_key = os.environ.get("CLOUDINARY_API_KEY"), 
-  api_secret = os.environ.get("CLOUDINARY_API_SECRET") 
-)
+from io import BytesIO
+from engine import uploads
 
 def basic_setup():
     # Remove default header and footer
@@ -49,18 +39,27 @@ def image_upload():
         st.session_state.image_urls = {}
 
 
-    uploaded_file = st.file_uploader("Choose an image", type=["jpg", "jpeg", "png"], key="uploader")
-    if uploaded_file is not None and st.button("Add Image"):
-        if len(st.session_state.uploaded_images) < 3:
-            image_bytes = uploaded_file.read()
-            
-            # Upload to Cloudinary
-            cdn_url = upload_to_cloudinary(image_bytes)
-            
-            st.session_state.uploaded_images.append((image_bytes, cdn_url))
-            filename = uploaded_file.name
-            st.session_state.image_urls[filename] = cdn_url
-            st.success(f"Image {len(st.session_state.uploaded_images)} added and uploaded to CDN successfully!")
+    uploaded_files = st.file_uploader("Choose images", type=["jpg", "jpeg", "png"], key="uploader",
+                                      accept_multiple_files=True)
+    if uploaded_files and st.button("Add Images"):
+        free_slots = 3 - len(st.session_state.uploaded_images)
+        if free_slots > 0:
+            queued_files = uploaded_files[:free_slots]
+            if len(uploaded_files) > free_slots:
+                st.warning(f"Maximum 3 images allowed. Only the first {free_slots} will be added.")
+            images_bytes = [uploaded_file.read() for uploaded_file in queued_files]
+
+            # Upload all queued files to Cloudinary at once
+            upload_progress = st.progress(0)
+            def report_progress(index, done, total):
+                upload_progress.progress(done / total)
+                st.write(f"Uploaded {queued_files[index].name} ({done}/{total})")
+            cdn_urls = uploads.upload_many(images_bytes, on_progress=report_progress)
+
+            for uploaded_file, image_bytes, cdn_url in zip(queued_files, images_bytes, cdn_urls):
+                st.session_state.uploaded_images.append((image_bytes, cdn_url))
+                st.session_state.image_urls[uploaded_file.name] = cdn_url
+            st.success(f"{len(cdn_urls)} image(s) added and uploaded to CDN successfully!")
         else:
             st.warning("Maximum 3 images allowed. Please remove an image to add a new one.")
             